@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+import config
+
+class AttachmentCache:
+    """
+    On-disk cache of text extracted from attachments (PDF text pages + OCR pages).
+    Entries are content-addressed by the SHA-256 of the file; a (path, size, mtime)
+    index avoids re-hashing unchanged files. LRU eviction keeps the cache under max_bytes.
+    """
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or config.ATTACHMENT_CACHE_DIR
+        self.max_bytes = max_bytes or config.ATTACHMENT_CACHE_MAX_BYTES
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = {"stat": {}, "entries": {}}
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def _entry_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _digest(self, path):
+        st = os.stat(path)
+        stat_key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+        digest = self.index["stat"].get(stat_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            self.index["stat"][stat_key] = digest
+        return digest
+
+    def lookup(self, path):
+        """
+        Returns the cache entry for a file (empty if unseen):
+        {'digest', 'page_count', 'pages': {page_no: text}, 'ocr_pages': {page_no: text}}
+        Callers fill it in place and hand it back to store(), which only writes when pages were added.
+        """
+        with self.lock:
+            digest = self._digest(path)
+            entry = {"digest": digest, "page_count": None, "pages": {}, "ocr_pages": {}}
+            if digest in self.index["entries"]:
+                try:
+                    with open(self._entry_path(digest), 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    entry["page_count"] = data.get("page_count")
+                    # JSON object keys are strings; page numbers are ints everywhere else
+                    entry["pages"] = {int(k): v for k, v in data.get("pages", {}).items()}
+                    entry["ocr_pages"] = {int(k): v for k, v in data.get("ocr_pages", {}).items()}
+                    self.index["entries"][digest]["last_used"] = time.time()
+                    print(f"Attachment Cache: hit {digest[:8]} ({len(entry['pages']) + len(entry['ocr_pages'])} pages)")
+                except (OSError, ValueError):
+                    self.index["entries"].pop(digest, None)
+            entry["saved"] = self._shape(entry)
+            return entry
+
+    @staticmethod
+    def _shape(entry):
+        # Pages are only ever added, so counts tell whether an entry changed since lookup / store
+        return (entry["page_count"], len(entry["pages"]), len(entry["ocr_pages"]))
+
+    def store(self, entry):
+        with self.lock:
+            if entry.get("saved") == self._shape(entry):
+                return # Full cache hit: nothing new to write
+            digest = entry["digest"]
+            data = {k: entry[k] for k in ("page_count", "pages", "ocr_pages")}
+            try:
+                encoded = json.dumps(data).encode('utf-8')
+                with open(self._entry_path(digest), 'wb') as f:
+                    f.write(encoded)
+                self.index["entries"][digest] = {"size": len(encoded), "last_used": time.time()}
+                entry["saved"] = self._shape(entry)
+                self._evict()
+                self._save_index()
+            except OSError as e:
+                print(f"Attachment Cache Error: {e}")
+
+    def _evict(self):
+        entries = self.index["entries"]
+        total = sum(e["size"] for e in entries.values())
+        # Least recently used first
+        for digest in sorted(entries, key=lambda d: entries[d]["last_used"]):
+            if total <= self.max_bytes: break
+            total -= entries.pop(digest)["size"]
+            try:
+                os.remove(self._entry_path(digest))
+            except OSError:
+                pass
+
+        # Drop stat records pointing at evicted content
+        live = set(entries)
+        self.index["stat"] = {k: d for k, d in self.index["stat"].items() if d in live}
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
@@ -0,0 +1,150 @@
+import queue
+import re
+import threading
+
+import config
+import ocr_engine
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def get_pdf_ocr_pool():
+    """
+    Dedicated Tesseract pool for scanned PDFs (sized to the core count), so a long
+    document never starves the proactive screen OCR running on the shared pool.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ocr_engine.TesseractPool(workers=config.PDF_OCR_WORKERS)
+        return _pdf_pool
+
+def iter_scanned_pdf_text(path, dpi=None, max_pages=None, page_count=None, cached=None):
+    """
+    Pipelined OCR for scanned PDFs.
+    Renders pages one at a time on a background thread, OCRs them concurrently
+    and yields (page_no, text) in page order as soon as each page is ready.
+    Pages already in `cached` are not rendered; new results are recorded into it.
+    Closing the generator early stops rendering.
+    """
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    dpi = dpi or config.PDF_OCR_DPI
+    max_pages = max_pages or config.PDF_OCR_MAX_PAGES
+    if page_count is None:
+        page_count = pdfinfo_from_path(path).get("Pages", 0)
+    last_page = min(page_count, max_pages)
+
+    cached = cached if cached is not None else {}
+    pool = get_pdf_ocr_pool()
+    ordered = queue.Queue(maxsize=pool.workers * 2) # Bounded: renderer stays just ahead of OCR
+    stop = threading.Event()
+
+    def render():
+        try:
+            for page_no in range(1, last_page + 1):
+                if stop.is_set(): break
+                if page_no in cached:
+                    ordered.put((page_no, cached[page_no]))
+                    continue
+                images = convert_from_path(path, dpi=dpi, first_page=page_no, last_page=page_no)
+                if images:
+                    ordered.put((page_no, pool.submit(images[0], psm=3)))
+        except Exception as e:
+            ordered.put((None, e))
+        finally:
+            ordered.put(None) # Sentinel
+
+    threading.Thread(target=render, name="pdf-render", daemon=True).start()
+
+    try:
+        while True:
+            item = ordered.get()
+            if item is None: break
+            page_no, result = item
+            if page_no is None: raise result
+            if page_no not in cached:
+                cached[page_no] = result.result()
+            yield page_no, cached[page_no]
+    finally:
+        stop.set()
+        # Unblock the renderer if it is waiting on a full queue
+        while not ordered.empty():
+            try: ordered.get_nowait()
+            except queue.Empty: break
+
+_STOPWORDS = {"the", "and", "for", "with", "this", "that", "what", "which", "from", "about",
+              "does", "how", "why", "are", "was", "you", "can", "please", "explain", "summarize"}
+
+def _query_terms(query):
+    if not query: return set()
+    words = re.findall(r"[a-z0-9]{3,}", query.lower())
+    return {w for w in words if w not in _STOPWORDS}
+
+def iter_pdf_pages(path, entry=None):
+    """
+    Yields (page_no, text) lazily; pages are only parsed when pulled.
+    `entry` is an AttachmentCache entry: cached pages are served without touching the
+    PDF, freshly extracted pages (and the page count) are recorded into it.
+    """
+    entry = entry if entry is not None else {"page_count": None, "pages": {}}
+    cached = entry["pages"]
+    reader = None
+
+    if entry.get("page_count") is None:
+        import pypdf
+        reader = pypdf.PdfReader(path)
+        entry["page_count"] = len(reader.pages)
+
+    for page_no in range(1, entry["page_count"] + 1):
+        if page_no not in cached:
+            if reader is None:
+                import pypdf
+                reader = pypdf.PdfReader(path)
+            try:
+                cached[page_no] = reader.pages[page_no - 1].extract_text() or ""
+            except Exception:
+                cached[page_no] = ""
+        yield page_no, cached[page_no]
+
+def select_pages(pages, budget=None, query=None, scan_limit=None):
+    """
+    Collects page text from a (page_no, text) iterator until the character budget is full.
+    Without a query, pages are taken in order and the iterator is abandoned as soon as
+    the budget fills. With a query, up to scan_limit pages are scored by term hits and the
+    best pages are kept; output is always in page order with [Page N] markers.
+    """
+    budget = budget or config.ATTACHMENT_CHAR_BUDGET
+    terms = _query_terms(query)
+
+    if not terms:
+        parts, used = [], 0
+        for page_no, text in pages:
+            if not text.strip(): continue
+            chunk = f"[Page {page_no}]\n{text}"
+            parts.append(chunk[:budget - used])
+            used += len(parts[-1])
+            if used >= budget: break
+        return "\n".join(parts)
+
+    # Relevance mode: score each scanned page, then fill the budget best-first
+    scan_limit = scan_limit or config.ATTACHMENT_SCAN_PAGES
+    scored = []
+    for page_no, text in pages:
+        if text.strip():
+            lowered = text.lower()
+            score = sum(lowered.count(t) for t in terms)
+            scored.append((score, page_no, text))
+        if page_no >= scan_limit: break
+
+    # Best score first; ties (incl. no hits) keep document order
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    chosen, used = [], 0
+    for score, page_no, text in scored:
+        chunk = f"[Page {page_no}]\n{text}"[:budget - used]
+        chosen.append((page_no, chunk))
+        used += len(chunk)
+        if used >= budget: break
+
+    chosen.sort()
+    return "\n".join(chunk for _, chunk in chosen)
@@ -1,61 +1,332 @@
 
+import os
 import json
+import time
+import struct
 import threading
+import socketserver
+from collections import OrderedDict
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+import config
+from document_store import doc_key
+
+def apply_message(engine, data, notify=True):
+    """
+    Applies one editor message ('update_buffer' = full sync, 'apply_changes' = delta,
+    'focus' = tab switch, 'close' = document closed)
+    to the ContextEngine. Called by the UpdateQueue writer for both transports.
+    Returns (status_code, reply) with HTTP semantics: 200 ok, 409 resync, 400 bad request.
+    """
+    op = data.get('op')
+    file_path = data.get('file_path')
+
+    if op == 'update_buffer':
+        # Full sync (first push, tab switch, resync)
+        content = data.get('buffer_content')
+        if not file_path or content is None:
+            return 400, {"status": "bad_request"}
+        if engine:
+            engine.update_buffer(file_path, content, data.get('version'), notify=notify)
+        return 200, {"status": "ok"}
+
+    if op == 'focus':
+        # Tab switch: no content unless Cora's copy is missing or stale
+        if not file_path or not engine:
+            return 400, {"status": "bad_request"}
+        if engine.focus_buffer(file_path, data.get('version'), notify=notify):
+            return 200, {"status": "ok"}
+        return 409, {"status": "resync"}
+
+    if op == 'close':
+        # Closed in the editor: forget the buffer (unsaved edits may have been discarded)
+        if not file_path or not engine:
+            return 400, {"status": "bad_request"}
+        engine.close_buffer(file_path, notify=notify)
+        return 200, {"status": "ok"}
+
+    if op == 'apply_changes':
+        # Delta sync: contentChanges on top of base_version
+        changes = data.get('changes')
+        if not file_path or not isinstance(changes, list) or not engine:
+            return 400, {"status": "bad_request"}
+        applied, version = engine.apply_buffer_changes(file_path, data.get('base_version'), data.get('version'), changes, notify=notify)
+        if applied:
+            return 200, {"status": "ok", "version": version}
+        # Version mismatch -> extension resends the whole document
+        return 409, {"status": "resync", "version": version}
+
+    return 400, {"status": "bad_request"}
+
+class UpdateTicket:
+    """One submitted editor message; the submitting transport thread waits on it."""
+    def __init__(self, message):
+        self.message = message
+        self.result = None
+        self.done = threading.Event()
+
+    def finish(self, code, reply):
+        self.result = (code, reply)
+        self.done.set()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(config.BRIDGE_REPLY_TIMEOUT if timeout is None else timeout):
+            return 503, {"status": "busy"} # Extension treats it like any failure and resyncs
+        return self.result
+
+class UpdateQueue:
+    """
+    Single writer for editor updates. Transport threads only submit; one thread applies.
+    After the first update of a burst it waits BRIDGE_COALESCE_WINDOW, then per file:
+    orders the pending messages by editor version, drops everything older than the
+    newest full update (it replaces the document anyway) and applies the rest in order.
+    Listeners are notified once per batch instead of once per message.
+    """
+    def __init__(self, engine, window=None):
+        self.engine = engine
+        self.window = config.BRIDGE_COALESCE_WINDOW if window is None else window
+        self.cond = threading.Condition()
+        self.pending = [] # Tickets in arrival order
+        self.running = True
+        self.worker = threading.Thread(target=self._run, name="bridge-writer", daemon=True)
+        self.worker.start()
+
+    def submit(self, messages):
+        """Queues messages (one editor batch coalesces together). Returns their tickets."""
+        tickets = [UpdateTicket(message) for message in messages]
+        with self.cond:
+            self.pending.extend(tickets)
+            self.cond.notify()
+        return tickets
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                if not self.running: return
+            time.sleep(self.window) # Let the rest of the burst arrive
+            with self.cond:
+                batch, self.pending = self.pending, []
+            self._apply_batch(batch)
+
+    @staticmethod
+    def _in_version_order(tickets):
+        # Arrival order between HTTP threads is arbitrary; editor versions are not
+        versions = [ticket.message.get('version') for ticket in tickets]
+        if len(tickets) < 2 or not all(isinstance(v, int) for v in versions):
+            return tickets
+        return sorted(tickets, key=lambda ticket: ticket.message['version']) # Stable for equal versions
+
+    def _apply_batch(self, batch):
+        # 1. Group per file; the file touched last is applied last (and ends up active)
+        by_file = OrderedDict()
+        for ticket in batch:
+            path = ticket.message.get('file_path')
+            key = doc_key(path) if isinstance(path, str) and path else id(ticket)
+            by_file.setdefault(key, []).append(ticket)
+            by_file.move_to_end(key)
+
+        results = []
+        applied = []
+        superseded = 0
+        for tickets in by_file.values():
+            tickets = self._in_version_order(tickets)
+
+            # 2. A full update replaces the document: older messages for the file are moot
+            last_full = max((i for i, ticket in enumerate(tickets) if ticket.message.get('op') == 'update_buffer'), default=0)
+            for ticket in tickets[:last_full]:
+                results.append((ticket, 200, {"status": "superseded"}))
+                superseded += 1
+
+            # 3. Apply the rest in version order
+            for ticket in tickets[last_full:]:
+                try:
+                    code, reply = apply_message(self.engine, ticket.message, notify=False)
+                except Exception as e:
+                    print(f"Bridge Server Error: {e}")
+                    code, reply = 500, {"status": "error"}
+                results.append((ticket, code, reply))
+                if code == 200:
+                    applied.append(ticket.message)
+
+        # 4. One notification for the whole batch, before the editor sees its acks
+        if applied and self.engine:
+            self.engine.notify('buffer')
+        for ticket, code, reply in results:
+            ticket.finish(code, reply)
+
+        full = [os.path.basename(m['file_path']) for m in applied if m.get('op') == 'update_buffer']
+        if full or superseded:
+            note = f" ({superseded} superseded)" if superseded else ""
+            print(f"Bridge Server: Applied {len(applied)} update(s){note}; full sync: {', '.join(full) or 'none'}")
+
 class BridgeHandler(BaseHTTPRequestHandler):
     context_engine = None # Class variable or set via server
+    update_queue = None
 
     def do_POST(self):
-        if self.path == '/update_buffer':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                file_path = data.get('file_path')
-                content = data.get('buffer_content')
-                
-                if file_path and content is not None:
-                    # Update Context Engine
-                    if BridgeHandler.context_engine:
-                        BridgeHandler.context_engine.update_buffer(file_path, content)
-                    
-                    self.send_response(200)
-                    self.end_headers()
-                    self.wfile.write(b'{"status": "ok"}')
-                else:
-                    self.send_response(400)
-                    self.end_headers()
-                    self.wfile.write(b'{"status": "bad_request"}')
-                    
-            except Exception as e:
-                print(f"Bridge Server Error: {e}")
-                self.send_response(500)
-                self.end_headers()
-        else:
+        if self.path not in ('/update_buffer', '/apply_changes', '/focus', '/close'):
             self.send_response(404)
             self.end_headers()
+            return
+
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            data['op'] = self.path.lstrip('/')
+            (ticket,) = BridgeHandler.update_queue.submit([data])
+            code, reply = ticket.wait()
+            self._send_json(code, reply)
+
+        except Exception as e:
+            print(f"Bridge Server Error: {e}")
+            self.send_response(500)
+            self.end_headers()
+
+    def _send_json(self, code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def log_message(self, format, *args):
         pass # Suppress logging
 
+class FramedBridgeHandler(socketserver.StreamRequestHandler):
+    """
+    Persistent editor connection: 4-byte big-endian length + UTF-8 JSON per frame.
+    Client -> Cora: {"type": "batch", "id": n, "messages": [{op, ...}, ...]}
+    Cora -> client: {"type": "ack", "id": n, "results": [{code, ...}, ...]} (one per batch, in order)
+                    {"type": "diagnostics", "file_path", "diagnostics": [...]} (pushed after edits)
+    The client keeps one batch in flight and queues behind the ack, which is the backpressure.
+    """
+    context_engine = None
+    update_queue = None
+
+    def setup(self):
+        super().setup()
+        self.last_diagnostics = {} # path -> error signature last pushed on this connection
+
+    def handle(self):
+        print(f"Bridge Server: Editor connected from {self.client_address[0]}:{self.client_address[1]}")
+        try:
+            while True:
+                frame = self._read_frame()
+                if frame is None: break
+                self._handle_frame(frame)
+        except (ConnectionError, OSError) as e:
+            print(f"Bridge Server: Editor connection lost ({e})")
+        except ValueError as e:
+            # Undecodable or malformed frame: framing is out of sync, resync by reconnecting
+            print(f"Bridge Server: Malformed frame from editor ({e}). Closing connection.")
+        print("Bridge Server: Editor disconnected.")
+
+    def _read_frame(self):
+        header = self.rfile.read(4)
+        if len(header) < 4: return None
+        (length,) = struct.unpack('>I', header)
+        if length > config.BRIDGE_MAX_FRAME:
+            raise ConnectionError(f"frame of {length} bytes exceeds BRIDGE_MAX_FRAME")
+        body = self.rfile.read(length)
+        if len(body) < length: return None
+        frame = json.loads(body.decode('utf-8'))
+        # Only batches of message objects are valid; anything else closes the connection
+        if not isinstance(frame, dict) or frame.get('type') != 'batch':
+            raise ValueError("expected a batch frame")
+        messages = frame.get('messages')
+        if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+            raise ValueError("batch messages must be a list of objects")
+        return frame
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.wfile.write(struct.pack('>I', len(body)) + body)
+        self.wfile.flush()
+
+    def _handle_frame(self, frame):
+        engine = FramedBridgeHandler.context_engine
+        tickets = FramedBridgeHandler.update_queue.submit(frame['messages'])
+        results = []
+        touched = []
+        for ticket in tickets:
+            code, reply = ticket.wait()
+            reply = dict(reply, code=code)
+            results.append(reply)
+            path = ticket.message.get('file_path')
+            if code == 200 and reply.get('status') != 'superseded' and path not in touched:
+                touched.append(path)
+        self._send({"type": "ack", "id": frame.get('id'), "results": results})
+
+        for path in touched:
+            self._push_diagnostics(engine, path)
+
+    def _push_diagnostics(self, engine, path):
+        """Sends the buffer's syntax error (or an empty list once fixed) when it changed."""
+        if not engine or engine.documents.get(path) is None:
+            self.last_diagnostics.pop(path, None) # Closed: the editor cleared its markers
+            return
+        error, signature = engine.check_buffer(path) # Cached on the document; the copilot's check reuses it
+        if self.last_diagnostics.get(path, "") == signature: return
+        self.last_diagnostics[path] = signature
+
+        diagnostics = []
+        if error:
+            diagnostics.append({
+                "line": error.get('line') or 1,
+                "message": error.get('message', ''),
+                "language": error.get('language', ''),
+                "severity": "error",
+            })
+        self._send({"type": "diagnostics", "file_path": path, "diagnostics": diagnostics})
+
+class _BridgeTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
 class BridgeServer(threading.Thread):
-    def __init__(self, context_engine, port=54321):
+    def __init__(self, context_engine, port=54321, socket_port=None):
         super().__init__()
         self.context_engine = context_engine
         self.port = port
+        self.socket_port = socket_port or config.BRIDGE_SOCKET_PORT
         self.server = None
+        self.socket_server = None
+        self.update_queue = UpdateQueue(context_engine) # Both transports feed the one writer
         self.daemon = True # Auto-kill on exit
 
     def run(self):
         # Set shared context
         BridgeHandler.context_engine = self.context_engine
-        
+        FramedBridgeHandler.context_engine = self.context_engine
+        BridgeHandler.update_queue = self.update_queue
+        FramedBridgeHandler.update_queue = self.update_queue
+
+        # Persistent transport (one thread per editor connection, not per request)
+        try:
+            self.socket_server = _BridgeTCPServer(('127.0.0.1', self.socket_port), FramedBridgeHandler)
+            threading.Thread(target=self.socket_server.serve_forever, name="bridge-socket", daemon=True).start()
+            print(f"Bridge Server socket transport on 127.0.0.1:{self.socket_port}")
+        except OSError as e:
+            print(f"Bridge Server: socket transport unavailable ({e}). HTTP only.")
+
+        # HTTP transport (fallback for older extensions)
         self.server = ThreadingHTTPServer(('127.0.0.1', self.port), BridgeHandler)
         print(f"Bridge Server running on http://127.0.0.1:{self.port}")
         self.server.serve_forever()
 
     def stop(self):
+        self.update_queue.stop()
+        if self.socket_server:
+            self.socket_server.shutdown()
         if self.server:
             self.server.shutdown()
@@ -0,0 +1,62 @@
+from PIL import Image, ImageChops
+
+import config
+from frame import Frame
+
+class FrameChangeDetector:
+    """
+    Cheap change detection in front of OCR + LLM.
+    Compares a downsampled grayscale copy of each frame against the last analyzed one.
+    """
+    def __init__(self, size=None, pixel_delta=None, min_changed=None):
+        self.size = size or config.FRAME_DIFF_SIZE
+        self.pixel_delta = pixel_delta if pixel_delta is not None else config.FRAME_DIFF_PIXEL_DELTA
+        self.min_changed = min_changed if min_changed is not None else config.FRAME_DIFF_MIN_CHANGED
+
+        self.last_signature = None # Downsampled 'L' image of last analyzed frame
+
+        # Counters (frames skipped vs analyzed)
+        self.frames_analyzed = 0
+        self.frames_skipped = 0
+
+    def _signature(self, image):
+        if isinstance(image, Frame):
+            return image.downsample(self.size)
+        # BOX filter averages whole cells, so single-pixel noise (cursor blink) washes out
+        return image.convert('L').resize(self.size, Image.Resampling.BOX)
+
+    def check(self, image):
+        """
+        Returns (changed, signature): changed is True if the frame differs meaningfully
+        from the last analyzed frame. Unreadable input always counts as changed.
+        The frame only becomes the reference once commit(signature) is called, i.e. after
+        its analysis succeeded, so a failed or cancelled analysis is retried next time.
+        """
+        try:
+            signature = self._signature(image)
+        except Exception as e:
+            print(f"Change Detector Error: {e}")
+            self.frames_analyzed += 1
+            return True, None
+
+        if self.last_signature is not None:
+            diff = ImageChops.difference(signature, self.last_signature)
+            # Count cells whose mean brightness moved more than pixel_delta
+            changed = sum(diff.histogram()[self.pixel_delta + 1:])
+            if changed < self.min_changed:
+                self.frames_skipped += 1
+                return False, signature
+
+        self.frames_analyzed += 1
+        return True, signature
+
+    def commit(self, signature):
+        """Makes an analyzed frame the reference for later checks."""
+        if signature is not None:
+            self.last_signature = signature
+
+    def reset(self):
+        self.last_signature = None
+
+    def stats(self):
+        return {"analyzed": self.frames_analyzed, "skipped": self.frames_skipped}
@@ -2,12 +2,91 @@ import os
 
 # Ollama Settings
 OLLAMA_MODEL = "llava"
+OLLAMA_TEXT_MODEL = "llama3.2"        # Text-only fast path for well-OCR'd screens ("" disables)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_KEEP_ALIVE = "30m"             # Residency per request ("-1" = never unload)
+OLLAMA_RESIDENT_MODELS = [m for m in (OLLAMA_MODEL, OLLAMA_TEXT_MODEL) if m] # Pre-warmed at startup
+OLLAMA_TIMEOUT = 120                  # Seconds per HTTP request
+OLLAMA_COLD_LOAD_THRESHOLD = 0.5      # load_duration above this counts as a cold load
+OLLAMA_MAX_CONCURRENCY = 1            # Concurrent calls per model (1 = single local GPU)
+OLLAMA_PREEMPTIBLE_CLIENTS = 2        # Idle connections kept for preemptible (background) streams
+INFERENCE_AGING_SECONDS = 10.0        # Queued calls gain one priority class per this many seconds
 
 # Observer Settings
 CHECK_INTERVAL = 1.0  # Seconds between checks in Silent Mode (Reduced for faster scanning)
 PROACTIVE_THRESHOLD = 0.8  # Confidence threshold to show UI (conceptually)
 WRITING_THRESHOLD = 0.35    # Lower threshold for productivity mode
 
+# Editor Bridge
+BRIDGE_SOCKET_PORT = 54322      # Persistent framed-TCP transport (HTTP stays on 54321)
+BRIDGE_MAX_FRAME = 64 * 1024 * 1024  # Largest accepted frame (bytes)
+BRIDGE_COALESCE_WINDOW = 0.03   # Writer waits this long after the first update to batch the burst (s)
+BRIDGE_REPLY_TIMEOUT = 10.0     # Longest a transport waits for the writer to apply its update (s)
+
+# Copilot Scheduler (event-driven; these timers only run while relevant)
+WINDOW_POLL_INTERVAL = 0.5      # Title polling when WinEvent hooks are unavailable (non-Windows)
+VISUAL_CHECK_INTERVAL = 1.5     # Re-check cadence for visually monitored windows (terminal/browser)
+TYPING_POLL_INTERVAL = 0.5      # Resumed-typing check while a writing suggestion is visible
+
+# Screen Capture
+CAPTURE_MODE = "window"         # "window" = active window only, "monitor" = full primary monitor
+CAPTURE_MIN_WINDOW_SIZE = 200   # Windows smaller than this (px) fall back to full monitor
+CAPTURE_MAX_SIDE = 3000         # Downscale bound for OCR / model images (keeps text readable)
+
+# Vision Payload (what is actually sent to the model)
+VISION_INPUT_SIDE = 1344        # LLaVA-1.6 AnyRes upper bound (672px tiles); larger is resampled away
+VISION_INPUT_PIXELS = 1344 * 672  # Max area after resize
+PAYLOAD_FORMAT = "JPEG"         # "JPEG", "WEBP" (falls back to JPEG without libwebp) or "PNG"
+PAYLOAD_QUALITY = 85            # JPEG/WebP quality; 80-90 keeps small UI text legible
+PAYLOAD_CROP_TO_TEXT = True     # Crop empty margins / wallpaper around text-dense content
+PAYLOAD_CROP_MIN_DENSITY = 0.02 # Fraction of edge pixels for a row/column to count as content
+
+# Frame Change Detection (skip OCR + LLM when the screen is static)
+FRAME_DIFF_SIZE = (64, 36)      # Downsampled grid used for comparison
+FRAME_DIFF_PIXEL_DELTA = 12     # Min brightness change (0-255) for a cell to count as changed
+FRAME_DIFF_MIN_CHANGED = 2      # Min changed cells for a frame to be re-analyzed
+
+# Workspace File Index
+FILE_INDEX_POLL_INTERVAL = 5.0  # Rescan interval (s) when watchdog is not installed
+CACHE_DIR = os.path.join(os.getcwd(), "cache")
+CHATS_DIR = os.path.join(os.getcwd(), "chats")
+APP_DATA_DIRS = [CACHE_DIR, CHATS_DIR]  # Cora's own writes: never indexed, never a 'file' event
+
+# Editor Documents
+DOCUMENT_STORE_MAX_CHARS = 64 * 1024 * 1024  # LRU bound on synced buffers (code points, not encoded bytes)
+
+# Syntax Validation
+SYNTAX_CACHE_SIZE = 64          # (path, content hash) parse results kept (LRU)
+INCREMENTAL_SYNTAX_MIN_LINES = 2000  # Files this long are checked block-by-block
+SYNTAX_WORKERS = 2              # Worker processes for non-Python validators
+SYNTAX_TIMEOUT = 1.0            # Seconds before a validator is abandoned (and its worker killed)
+SYNTAX_POOL_START_TIMEOUT = 60.0  # Worker start-up budget (spawn re-imports the app; not counted in SYNTAX_TIMEOUT)
+
+# OCR Settings
+OCR_TILE_ROWS = 8               # Incremental OCR bands (full width; only changed bands are re-recognized)
+OCR_TILE_OVERLAP = 40           # Pixels each band extends into its neighbours (> a text line's height)
+OCR_WORKERS = max(2, (os.cpu_count() or 2) // 2)  # Resident Tesseract workers
+OCR_QUEUE_SIZE = 64             # Pending OCR jobs before submit() blocks
+TEXT_ROUTE_MIN_CHARS = 200      # OCR text needed before the vision model is skipped
+TEXT_ROUTE_MIN_CONFIDENCE = 75  # Mean Tesseract word confidence (0-100) needed for the text path
+
+# Attachments
+ATTACHMENT_CHAR_BUDGET = 50000  # Max attachment characters placed in the prompt
+ATTACHMENT_SCAN_PAGES = 300     # Pages scanned when ranking PDF pages against the query
+ATTACHMENT_CACHE_DIR = os.path.join(CACHE_DIR, "attachments")
+ATTACHMENT_CACHE_MAX_BYTES = 200 * 1024 * 1024  # LRU eviction above this size
+
+# Scanned PDF OCR (attachments)
+PDF_OCR_DPI = 200               # Render resolution for scanned pages
+PDF_OCR_MAX_PAGES = 200         # Hard cap on pages OCR'd per document
+PDF_OCR_WORKERS = os.cpu_count() or 2
+
+# Suggestion Cache (proactive responses, persisted across restarts)
+SUGGESTION_CACHE_PATH = os.path.join(CACHE_DIR, "suggestions.json")
+SUGGESTION_CACHE_MAX_ENTRIES = 500  # LRU eviction above this count
+SUGGESTION_CACHE_TTL = 10 * 60      # Screen suggestions (same screen + window -> same answer)
+ERROR_FIX_CACHE_TTL = 7 * 24 * 3600 # Error fixes (keyed by error signature + code context)
+
 # System Prompt
 SYSTEM_PROMPT = """
 You are Cora, an intelligent OS-level observer.
@@ -39,6 +118,15 @@ RULES:
 - If the screen is static or has no clear actionable items, return confidence 0.0.
 """
 
+# Same rules as SYSTEM_PROMPT for the text-only path (no image is attached)
+TEXT_SYSTEM_PROMPT = SYSTEM_PROMPT.replace("""VISION GROUNDING RULES (STRICT):
+1. You have perfect vision. The image provided IS the user's screen.
+2. NEVER say "I cannot see" or "I am text-based".
+3. Extract text visually from the image if needed.""", """GROUNDING RULES (STRICT):
+1. The OCR text provided IS the user's screen.
+2. NEVER say "I cannot see" or ask for a screenshot.
+3. Work only from the text given.""")
+
 PRODUCTIVITY_SYSTEM_PROMPT = """
 ## ROLE: AI Editor & Writing Assistant
 You are analyzing the user's active document (Image/Text).
@@ -5,12 +5,23 @@ import hashlib
 import platform
 import threading
 import ctypes
+from collections import OrderedDict
+
+import config
+import file_index
+import incremental_syntax
+import syntax_validators
+import document_store
+from text_buffer import LineIndex
 
 try:
     import pygetwindow as gw
 except ImportError:
     gw = None
 
+# Every extension Cora can validate: Python in-process, the rest via the validator registry
+CODE_EXTENSIONS = frozenset({'.py'} | set(syntax_validators.VALIDATORS))
+
 class ContextEngine:
     def __init__(self, workspace_path=os.getcwd()):
         self.workspace_path = workspace_path
@@ -19,9 +30,25 @@ class ContextEngine:
         self.last_error_signature = None 
         
         # Buffer Integration (VS Code / Unsaved Changes)
+        # Every synced editor document lives in the store; active_buffer_path is the focused one
+        self.documents = document_store.DocumentStore()
         self.active_buffer_path = None
-        self.active_buffer_content = None
         self.active_buffer_timestamp = 0
+
+        # Change Listeners (event-driven copilot): callback(source) for 'buffer' / 'file'
+        self.listeners = []
+
+        # Workspace File Index (replaces per-tick os.walk)
+        self.file_index = file_index.FileIndex(self.get_search_paths(), on_change=self._on_file_changed)
+        self.file_index.start()
+
+        # Syntax Results Cache: (path, content hash) -> (error, error_signature), LRU
+        self.syntax_cache = OrderedDict()
+        self.syntax_lock = threading.Lock() # Copilot thread + bridge connections share the cache
+        self.incremental_checker = incremental_syntax.IncrementalPythonChecker()
+        self.incremental_lock = threading.Lock()
+        self.validator_pool = syntax_validators.ValidatorPool()
+        self.validator_pool.warm_up_async() # Worker start-up stays out of the first check's timeout
         
     def get_active_window_title(self):
         try:
@@ -42,52 +69,125 @@ class ContextEngine:
         except Exception:
             return "Unknown"
 
-    def update_buffer(self, file_path, content):
+    def get_active_window_rect(self):
         """
-        updates internal state from external editor (VS Code extension)
+        Returns the foreground window's bounding box as (left, top, width, height), or None.
         """
+        try:
+            if gw:
+                win = gw.getActiveWindow()
+                if win and not win.isMinimized:
+                    return (win.left, win.top, win.width, win.height)
+
+            # Fallback for Windows
+            class RECT(ctypes.Structure):
+                _fields_ = [("left", ctypes.c_long), ("top", ctypes.c_long),
+                            ("right", ctypes.c_long), ("bottom", ctypes.c_long)]
+
+            hwnd = ctypes.windll.user32.GetForegroundWindow()
+            rect = RECT()
+            if hwnd and ctypes.windll.user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+                return (rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top)
+        except Exception:
+            pass
+        return None
+
+    @property
+    def active_buffer_content(self):
+        doc = self.documents.get(self.active_buffer_path)
+        return doc.text() if doc is not None else None
+
+    def _set_active(self, file_path):
         self.active_buffer_path = file_path
-        self.active_buffer_content = content
         self.active_buffer_timestamp = time.time()
-        print(f"ContextEngine: Buffer updated for {os.path.basename(file_path)}")
 
-    def get_last_modified_file(self, extensions=['.py', '.js', '.ts', '.css', '.html']):
+    def update_buffer(self, file_path, content, version=None, notify=True):
+        """
+        updates internal state from external editor (VS Code extension)
+        Full sync: replaces the stored document (first push, or resync after a version mismatch).
+        notify=False leaves notifying listeners to the caller (the bridge notifies once per batch).
+        """
+        self.documents.put(file_path, content, version)
+        self._set_active(file_path)
+        if notify:
+            print(f"ContextEngine: Buffer updated for {os.path.basename(file_path)}")
+            self.notify('buffer')
+
+    def apply_buffer_changes(self, file_path, base_version, version, changes, notify=True):
+        """
+        Delta sync: applies editor contentChanges ({'offset', 'length', 'text'}, in order)
+        on top of base_version. Returns (applied, current_version); applied is False when the
+        stored document is not at base_version, in which case the editor must send a full resync.
+        """
+        applied, current = self.documents.apply(file_path, base_version, version, changes)
+        if applied:
+            self._set_active(file_path)
+            if notify: self.notify('buffer')
+        return applied, current
+
+    def focus_buffer(self, file_path, version, notify=True):
+        """
+        Tab switch: makes a stored document active without resending it.
+        Returns False when the stored copy is missing or stale (editor must send it in full).
+        """
+        if not self.documents.focus(file_path, version):
+            return False
+        self._set_active(file_path)
+        if notify: self.notify('buffer')
+        return True
+
+    def close_buffer(self, file_path, notify=True):
+        """Editor closed the document: drop the stored copy so reads fall back to disk."""
+        if not self.documents.remove(file_path):
+            return False
+        if self.active_buffer_path and document_store.doc_key(self.active_buffer_path) == document_store.doc_key(file_path):
+            self.active_buffer_path = None
+        if notify: self.notify('buffer')
+        return True
+
+    def check_buffer(self, file_path):
+        """Syntax result for a stored document, cached on the document until its next edit."""
+        doc = self.documents.get(file_path)
+        if doc is None: return None, None
+        syntax = doc.syntax
+        if syntax is None:
+            version = doc.version
+            syntax, known = self._check_syntax(file_path, doc.text())
+            if known and doc.version == version: # Not edited meanwhile
+                doc.syntax = syntax
+        return syntax
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def notify(self, source):
+        for callback in self.listeners:
+            try:
+                callback(source)
+            except Exception as e:
+                print(f"ContextEngine: listener error: {e}")
+
+    def _on_file_changed(self, path):
+        # Only source files can change a snapshot (build output, logs etc. are noise)
+        if os.path.splitext(path)[1].lower() in CODE_EXTENSIONS:
+            self.notify('file')
+
+    def get_search_paths(self):
+        # SEARCH STRATEGY:
+        # 1. Current CWD
+        # 2. Parent directory (if we are in a subdir like 'cora')
+        search_paths = [self.workspace_path]
+        if os.path.basename(self.workspace_path) in ['cora', 'src', 'app']:
+            search_paths.append(os.path.dirname(self.workspace_path))
+        return search_paths
+
+    def get_last_modified_file(self, extensions=CODE_EXTENSIONS):
         # If we have a recent buffer update (within last 30 seconds), prefer that
         if self.active_buffer_path and (time.time() - self.active_buffer_timestamp < 30):
              return self.active_buffer_path
 
         try:
-            most_recent_file = None
-            most_recent_time = 0
-            
-            # SEARCH STRATEGY:
-            # 1. Current CWD
-            # 2. Parent directory (if we are in a subdir like 'cora')
-            search_paths = [self.workspace_path]
-            parent_dir = os.path.dirname(self.workspace_path)
-            if os.path.basename(self.workspace_path) in ['cora', 'src', 'app']:
-                search_paths.append(parent_dir)
-
-            for search_path in search_paths:
-                for root, dirs, files in os.walk(search_path):
-                    # optimized skip
-                    if '.git' in dirs: dirs.remove('.git')
-                    if 'venv' in dirs: dirs.remove('venv')
-                    if '__pycache__' in dirs: dirs.remove('__pycache__')
-                    if 'node_modules' in dirs: dirs.remove('node_modules')
-                    
-                    for file in files:
-                        _, ext = os.path.splitext(file)
-                        if ext in extensions:
-                            full_path = os.path.join(root, file)
-                            try:
-                                mtime = os.path.getmtime(full_path)
-                                if mtime > most_recent_time:
-                                    most_recent_time = mtime
-                                    most_recent_file = full_path
-                            except OSError:
-                                continue
-            
+            most_recent_file = self.file_index.most_recent(extensions)
             self.last_modified_file = most_recent_file
             return most_recent_file
         except Exception as e:
@@ -99,18 +199,76 @@ class ContextEngine:
         Generic syntax checker that dispatches to specific parsers based on extension.
         """
         if not file_path: return None
+
+        # Stored editor documents are validated from memory, never from disk
+        if content is None:
+            doc = self.documents.get(file_path)
+            if doc is not None:
+                content = doc.text()
         
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
         
         if ext == '.py':
+            # In-process: C-speed ast.parse plus per-file incremental state
             return self.validate_python_syntax(file_path, content)
-        # Placeholder for JS/TS/Other parsers
-        # elif ext in ['.js', '.ts']:
-        #     return self.validate_js_syntax(file_path, content)
+
+        # Other languages: registry validators, isolated in worker processes with a timeout
+        if syntax_validators.supports(ext):
+            try:
+                if content is None:
+                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                        content = f.read()
+                if not content.strip():
+                    return None
+
+                error = self.validator_pool.validate(ext, content)
+                if error:
+                    error["file"] = file_path
+                    error["context"] = self.get_file_context(file_path, error.get("line") or 0, content)
+                return error
+            except syntax_validators.ValidatorUnavailable:
+                raise # Unknown result; check_syntax must not memoize it
+            except Exception:
+                return None
             
         return None
 
+    def check_syntax(self, file_path, content=None):
+        """
+        Memoized validate_syntax. Returns (error, error_signature), re-parsing only
+        when the (path, content hash) pair has not been seen recently.
+        """
+        return self._check_syntax(file_path, content)[0]
+
+    def _check_syntax(self, file_path, content):
+        """check_syntax plus whether the result is known (a validator that didn't run isn't)."""
+        if content is None:
+            try:
+                error = self.validate_syntax(file_path)
+            except syntax_validators.ValidatorUnavailable:
+                return (None, None), False
+            return (error, self.generate_error_signature(error)), True
+
+        digest = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        key = (file_path, digest)
+        with self.syntax_lock:
+            cached = self.syntax_cache.get(key)
+            if cached is not None:
+                self.syntax_cache.move_to_end(key)
+                return cached, True
+
+        try:
+            error = self.validate_syntax(file_path, content)
+        except syntax_validators.ValidatorUnavailable:
+            return (None, None), False # Not memoized: the next check retries
+        result = (error, self.generate_error_signature(error))
+        with self.syntax_lock:
+            self.syntax_cache[key] = result
+            if len(self.syntax_cache) > config.SYNTAX_CACHE_SIZE:
+                self.syntax_cache.popitem(last=False)
+        return result, True
+
     def validate_python_syntax(self, file_path, content=None):
         """
         Parses Python file or content string to detect syntax errors.
@@ -124,12 +282,18 @@ class ContextEngine:
             if not content.strip(): 
                 return None
 
-            ast.parse(content)
+            # Large buffers: re-parse only the edited top-level blocks
+            if content.count('\n') >= config.INCREMENTAL_SYNTAX_MIN_LINES:
+                with self.incremental_lock:
+                    self.incremental_checker.check(file_path, content)
+            else:
+                ast.parse(content)
             return None # No errors
             
         except SyntaxError as e:
             return {
                 "type": "SyntaxError",
+                "language": "Python",
                 "message": e.msg,
                 "file": file_path,
                 "line": e.lineno,
@@ -144,21 +308,25 @@ class ContextEngine:
         Extracts lines around the error from content string or file.
         """
         try:
-            if content is None:
+            doc = self.documents.get(path)
+            if doc is not None and (content is None or content is doc.text()):
+                index = doc.line_index # Built once per document version
+            elif content is None:
                 with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                     lines = f.readlines()
+                     index = LineIndex(f.read())
             else:
-                 lines = content.splitlines(keepends=True)
+                 index = LineIndex(content)
             
             if line_no > 0:
-                start = max(0, line_no - context_lines // 2 - 1)
-                end = min(len(lines), line_no + context_lines // 2)
+                start = line_no - context_lines // 2 - 1
+                end = line_no + context_lines // 2
             else:
                 # If no line number (e.g. general context), return head or generic chunks
                 start = 0
-                end = min(len(lines), context_lines)
+                end = context_lines
             
-            return "".join(lines[start:end])
+            # One slice of the text between two line starts, not a join over split lines
+            return index.slice(start, end)
         except Exception:
             return ""
 
@@ -268,24 +436,18 @@ class ContextEngine:
                 # Clean decoration characters (VS Code dirty dot '●', asterisks, brackets)
                 clean_part = part.strip(" ●*•[]()")
                 
-                if any(clean_part.endswith(ext) for ext in ['.py', '.js', '.ts', '.html', '.css', '.java', '.c', '.cpp']):
-                    found_candidate = False
-                    search_paths = [self.workspace_path]
-                    parent_dir = os.path.dirname(self.workspace_path)
-                    if os.path.basename(self.workspace_path) in ['cora', 'src', 'app']:
-                        search_paths.append(parent_dir)
-
-                    for search_path in search_paths:
-                        for root, _, files in os.walk(search_path):
-                            if clean_part in files:
-                                # Found it!
-                                active_file_candidate = os.path.join(root, clean_part)
-                                # print(f"DEBUG Found Candidate: {active_file_candidate} in {root}")
-                                found_candidate = True
-                                break
-                        if found_candidate: break
-                    
-                    if active_file_candidate: break
+                if os.path.splitext(clean_part)[1].lower() in CODE_EXTENSIONS:
+                    # Open editor documents first (covers unsaved files), then the basename index
+                    stored = self.documents.find_by_basename(clean_part)
+                    if stored:
+                        active_file_candidate = stored
+                        break
+                    # Basename index lookup (ranked: most recent, then closest to workspace root)
+                    matches = self.file_index.resolve(clean_part)
+                    if matches:
+                        active_file_candidate = matches[0]
+                        # print(f"DEBUG Found Candidate: {active_file_candidate}")
+                        break
             
             # 2. If no title match, fallback to Buffer or Last Modified
             last_file = self.active_buffer_path if self.active_buffer_path else (active_file_candidate or self.get_last_modified_file())
@@ -296,12 +458,11 @@ class ContextEngine:
                 # Determine Content Source
                 current_content = None
                 
-                # If this matches our active buffer, use memory content
-                if (self.active_buffer_path and 
-                    os.path.normpath(last_file) == os.path.normpath(self.active_buffer_path) and
-                    self.active_buffer_content):
-                    
-                    current_content = self.active_buffer_content
+                # Any synced editor document (not just the focused one) is served from memory
+                doc = self.documents.get(last_file)
+                if doc is not None:
+                    current_content = doc.text()
+                    error, error_signature = self.check_buffer(last_file)
                 else:
                     # Fallback to disk read
                     try:
@@ -309,14 +470,13 @@ class ContextEngine:
                             current_content = f.read()
                     except:
                         pass
+                    # PROACTIVE: Check errors (Generic Syntax Validation)
+                    error, error_signature = self.check_syntax(last_file, content=current_content)
                 
                 snapshot["file_content"] = current_content
-
-                # PROACTIVE: Check errors (Generic Syntax Validation)
-                error = self.validate_syntax(last_file, content=current_content)
                 if error:
                     snapshot["error"] = error
-                    snapshot["error_signature"] = self.generate_error_signature(error)
+                    snapshot["error_signature"] = error_signature
 
         # TERMINAL: file based (fallback)
         elif mode_secondary == "terminal":
@@ -2,9 +2,12 @@
 import time
 import json
 import os
-from PyQt6.QtCore import QThread, pyqtSignal
+import queue
+from PyQt6.QtCore import QThread, Qt, pyqtSignal
 
 import config
+from event_sources import ForegroundWindowWatcher
+from inference_pipeline import InferencePipeline
 
 class CopilotController(QThread):
     def __init__(self, context_engine, observer, overlay):
@@ -33,6 +36,18 @@ class CopilotController(QThread):
         # Proactive context storage (for grounded suggestion execution)
         self.last_proactive_context = None
 
+        # Event Queue (window / buffer / file / pause signals wake the loop)
+        self.events = queue.Queue()
+        self.paused = False
+        self.window_watcher = None
+
+        # Inference Pipeline (model calls never block this thread)
+        # context_version increments whenever in-flight results would become stale
+        self.context_version = 0
+        self.results = queue.Queue()
+        self.pipeline = InferencePipeline()
+        self.pipeline.result_ready.connect(self.on_inference_result, Qt.ConnectionType.DirectConnection)
+
 
     def on_user_dismissed(self):
         # Add current error/visual sig to dismissed
@@ -46,6 +61,7 @@ class CopilotController(QThread):
     def on_user_snoozed(self, mins):
         self.snoozed_until = time.time() + (mins * 60)
         print(f"Copilot: Snoozed for {mins} minutes.")
+        self.post_event('snooze')
 
     # ... (Start loop remains same) ...
 
@@ -72,10 +88,44 @@ class CopilotController(QThread):
     def pause(self):
         self.paused = True
         print("Copilot Controller: Paused.")
+        self._supersede("paused")
+        self.post_event('pause')
 
     def resume(self):
         self.paused = False
         print("Copilot Controller: Resumed.")
+        self.post_event('resume')
+
+    def post_event(self, source):
+        """Wakes the scheduler; safe to call from any thread (window hook, bridge, file watcher, UI)."""
+        self.events.put(source)
+
+    def on_inference_result(self, kind, version, result):
+        # Runs on the pipeline thread; handed to the copilot thread to keep state single-threaded
+        self.results.put((kind, version, result))
+        self.post_event('result')
+
+    def _supersede(self, reason):
+        """Marks the current context as changed: in-flight work is cancelled and late results dropped."""
+        self.context_version += 1
+        if self.pipeline.is_busy():
+            print(f"Copilot: Cancelling in-flight inference ({reason}).")
+        self.pipeline.cancel()
+
+    def _drain_results(self):
+        deliver = {
+            'error': self.deliver_error_fix,
+            'visual': self.deliver_visual,
+            'writing': self.deliver_writing,
+            'reading': self.deliver_reading,
+        }
+        while not self.results.empty():
+            kind, version, result = self.results.get_nowait()
+            if not result: continue
+            if version != self.context_version:
+                print(f"Copilot: Dropping stale {kind} result (v{version}, now v{self.context_version}).")
+                continue
+            deliver[kind](result)
 
     def run(self):
         self.start_proactive_loop()
@@ -84,163 +134,216 @@ class CopilotController(QThread):
         self.running = True
         self.paused = False
         print("Copilot Controller: Proactive Loop Started.")
-        
+
+        # Event Sources: window changes, buffer pushes, file changes (timers are computed per tick)
+        self.context_engine.add_listener(self.post_event)
+        self.window_watcher = ForegroundWindowWatcher(self.context_engine, lambda: self.post_event('window'))
+        self.window_watcher.start()
+
+        next_check_at = time.time() # First snapshot immediately
         while self.running:
+            # Sleep until an input changes or the next timer is due
+            timeout = None if next_check_at is None else max(0.0, next_check_at - time.time())
             try:
-                # 0. Check Pause and Snooze
-                if self.paused:
-                    time.sleep(0.5)
-                    continue
-
-                if time.time() < self.snoozed_until:
-                    time.sleep(2)
-                    continue
-
-                # 1. Get OS/Context Snapshot
-                snapshot = self.context_engine.get_context_snapshot()
-                current_window = snapshot.get('window_title', '')
-                current_mode = snapshot.get('mode', 'unknown') # Backwards compat
-                mode_primary = snapshot.get('mode_primary', current_mode)
-                mode_secondary = snapshot.get('mode_secondary', 'unknown')
-                
-                # FIX 2: Skip Cora's own UI (internal mode)
-                if mode_primary == "internal":
-                    time.sleep(0.2)
-                    continue
-                
-                # Skip Cora suggestion window (not internal, but nothing to analyze)
-                cw_lower = (current_window or "").lower()
-                if "cora suggestion" in cw_lower:
-                    time.sleep(0.5)
-                    continue
-                
-                idle_time = self.context_engine.get_idle_time()
-                
-                # DEBUG: Pulse Check
-                if self.loop_count % 3 == 0:
-                    print(f"Copilot Pulse: Mode=[{mode_primary}/{mode_secondary}] Idle=[{idle_time:.1f}s] Window=[{current_window}]")
-
-                # ---------------------------------------------------------
-                # A. APP SWITCH PRESENCE MODE
-                # ---------------------------------------------------------
-                if current_window != self.last_active_window:
-                    print(f"Copilot: 🔄 App Switch Detected -> {current_window}")
-                    self.last_active_window = current_window
-                    
-                    # Skip reset if switching TO Cora's own windows
-                    cw_lower = current_window.lower() if current_window else ""
-                    if cw_lower in ["cora ai", "cora suggestion"]:
-                        time.sleep(0.5)
-                        continue
-                    
-                    # Reset visual suggestion state for new window
-                    self.observer.signals.error_resolved.emit() # Collapse to idle orb
-                    self.last_visual_sig = None
-                    # NOTE: Do NOT reset last_error_signature here.
-                    # The error signature includes the code text, so it will
-                    # naturally update when the user actually fixes the code.
-                    # Resetting it here causes re-triggering on every app switch.
-                    
-                    # Short grace period to let UI settle
-                    time.sleep(1.0) 
-                    continue
-
-                # ---------------------------------------------------------
-                # B. PRIORITY: Check for Errors (Syntax/Runtime)
-                # ---------------------------------------------------------
-                if snapshot.get("error"):
-                    err_sig = snapshot.get("error_signature")
-                    
-                    # Only trigger if this is a NEW error signature
-                    if err_sig != self.last_error_signature:
-                        self.last_error_signature = err_sig
-                        
-                        # Check if this specific error was dismissed
-                        if err_sig in self.dismissed_signatures:
-                            print(f"Copilot: Skipping dismissed error: {err_sig}")
-                        else:
-                            self.handle_new_error(snapshot)
-                
-                # ---------------------------------------------------------
-                # C. WRITING MODE (Productivity Suggestion Mode)
-                # ---------------------------------------------------------
-                elif mode_primary == 'writing':
-                    # Ensure we don't stick in "error" state from previous mode
-                    if self.last_error_signature:
-                         print("Copilot: Mode switched to WRITING. Clearing error state.")
-                         self.observer.signals.error_resolved.emit()
-                         self.last_error_signature = None
-                         self.dismissed_signatures.clear() # Optional: clear dismissed history for fresh start
-
-                    if idle_time > 1.5:
-                        # IDLE: Check for suggestions
-                        if time.time() - self.last_writing_check_time > 3.0: # Check more frequently (every 3s vs 5s)
-                             self.handle_writing_assistance(snapshot)
-                             self.last_writing_check_time = time.time()
-                    else:
-                        # ACTIVE: User is typing
-                        # If we have a lingering suggestion, clear it explicitly
-                        if self.last_visual_sig is not None:
-                             print("Copilot: ⌨️ User resumed typing. Claring suggestion.")
-                             self.observer.signals.error_resolved.emit()
-                             self.last_visual_sig = None
-
-                # ---------------------------------------------------------
-                # D. READING MODE (PDF/E-Book Mode)
-                # ---------------------------------------------------------
-                elif mode_primary == 'reading':
-                    # Similar to Writing, but focused on summaries/explanation
-                    # Clear errors
-                    if self.last_error_signature:
-                         self.observer.signals.error_resolved.emit()
-                         self.last_error_signature = None
-                    
-                    if idle_time > 2.0: # Slightly longer pause for reading
-                        # Check less frequently to avoid spamming while user reads
-                         if time.time() - self.last_writing_check_time > 10.0: 
-                             self.handle_reading_assistance(snapshot)
-                             self.last_writing_check_time = time.time()
-
-                # ---------------------------------------------------------
-                # ---------------------------------------------------------
-                # E. FALLBACK: Visual / Maintenance
-                # ---------------------------------------------------------
-                else:
-                    # No error found currently.
-                    
-                    # CRITICAL FIX 3: Conservative Hiding
-                    should_hide = False
-                    if mode_primary == 'developer':
-                        should_hide = True # We are in code, but no error found -> Fixed!
-                    elif mode_primary == 'general':
-                        should_hide = True # Switched context completely
-                    
-                    if not should_hide:
-                        pass # Maintain state
-                        
-                    # Check if we just resolved an error
-                    elif self.last_error_signature:
-                        print(f"Copilot: Resolving error. Mode={mode_primary} Title='{current_window}'")
-                        self.last_error_signature = None
-                        self.dismissed_signatures.clear()
-                        self.last_visual_sig = None
-                        self.handle_resolution()
-                    
-                    # Visual Fallback (Only if NOT writing mode, to avoid conflict)
-                    # Use Secondary Mode to allow Browser checks but block productive writing
-                    elif mode_primary not in ['writing', 'reading']:
-                        self.handle_visual_fallback(snapshot)
-
-                # Loop Frequency (Faster: 0.1s for immediate reaction)
-                time.sleep(0.1)
-                self.loop_count += 1
-                
+                sources = {self.events.get(timeout=timeout)}
+                while not self.events.empty(): # Coalesce bursts into one snapshot
+                    sources.add(self.events.get_nowait())
+            except queue.Empty:
+                sources = {'timer'}
+
+            if 'stop' in sources or not self.running:
+                break
+
+            try:
+                if 'result' in sources:
+                    self._drain_results()
+                    if sources == {'result'}:
+                        continue # Nothing else changed; keep the pending timer
+
+                delay = self.process_tick()
             except Exception as e:
                 print(f"Copilot Loop Exception: {e}")
-                time.sleep(1) # Prevent busy loop on crash
+                delay = 1.0 # Retry later rather than spinning on a crash
+            next_check_at = None if delay is None else time.time() + delay
+            self.loop_count += 1
+
+    def process_tick(self):
+        """
+        One scheduling step, run only when an input changed or a timer fired.
+        Returns seconds until the next timed re-check, or None to wait for events.
+        """
+        # 0. Check Pause and Snooze
+        if self.paused:
+            return None # resume() posts an event
+
+        if time.time() < self.snoozed_until:
+            return self.snoozed_until - time.time()
+
+        # 1. Get OS/Context Snapshot
+        snapshot = self.context_engine.get_context_snapshot()
+        current_window = snapshot.get('window_title', '')
+        current_mode = snapshot.get('mode', 'unknown') # Backwards compat
+        mode_primary = snapshot.get('mode_primary', current_mode)
+        mode_secondary = snapshot.get('mode_secondary', 'unknown')
+
+        # FIX 2: Skip Cora's own UI (internal mode)
+        if mode_primary == "internal":
+            return None # Next window change wakes us
+
+        # Skip Cora suggestion window (not internal, but nothing to analyze)
+        cw_lower = (current_window or "").lower()
+        if "cora suggestion" in cw_lower:
+            return None
+
+        idle_time = self.context_engine.get_idle_time()
+
+        # DEBUG: Pulse Check
+        if self.loop_count % 3 == 0:
+            frames = self.observer.change_detector.stats()
+            print(f"Copilot Pulse: Mode=[{mode_primary}/{mode_secondary}] Idle=[{idle_time:.1f}s] Window=[{current_window}] Frames=[analyzed {frames['analyzed']} / skipped {frames['skipped']}]")
+
+        # ---------------------------------------------------------
+        # A. APP SWITCH PRESENCE MODE
+        # ---------------------------------------------------------
+        if current_window != self.last_active_window:
+            print(f"Copilot: 🔄 App Switch Detected -> {current_window}")
+            self.last_active_window = current_window
+
+            # Skip reset if switching TO Cora's own windows
+            cw_lower = current_window.lower() if current_window else ""
+            if cw_lower in ["cora ai", "cora suggestion"]:
+                return None
+
+            # Reset visual suggestion state for new window
+            self._supersede("app switch")
+            self.observer.signals.error_resolved.emit() # Collapse to idle orb
+            self.last_visual_sig = None
+            # NOTE: Do NOT reset last_error_signature here.
+            # The error signature includes the code text, so it will
+            # naturally update when the user actually fixes the code.
+            # Resetting it here causes re-triggering on every app switch.
+
+            # Short grace period to let UI settle
+            return 1.0
+
+        # ---------------------------------------------------------
+        # B. PRIORITY: Check for Errors (Syntax/Runtime)
+        # ---------------------------------------------------------
+        if snapshot.get("error"):
+            err_sig = snapshot.get("error_signature")
+
+            # Only trigger if this is a NEW error signature
+            if err_sig != self.last_error_signature:
+                self.last_error_signature = err_sig
+
+                # Check if this specific error was dismissed
+                if err_sig in self.dismissed_signatures:
+                    print(f"Copilot: Skipping dismissed error: {err_sig}")
+                else:
+                    self.handle_new_error(snapshot)
+            return None # Buffer / file events re-check once the user edits
+
+        # ---------------------------------------------------------
+        # C. WRITING MODE (Productivity Suggestion Mode)
+        # ---------------------------------------------------------
+        elif mode_primary == 'writing':
+            # Ensure we don't stick in "error" state from previous mode
+            if self.last_error_signature:
+                 print("Copilot: Mode switched to WRITING. Clearing error state.")
+                 self._supersede("mode switch")
+                 self.observer.signals.error_resolved.emit()
+                 self.last_error_signature = None
+                 self.dismissed_signatures.clear() # Optional: clear dismissed history for fresh start
+
+            # Check more frequently (every 3s vs 5s)
+            return self._idle_timer(idle_time, 1.5, 3.0, self.handle_writing_assistance, snapshot)
+
+        # ---------------------------------------------------------
+        # D. READING MODE (PDF/E-Book Mode)
+        # ---------------------------------------------------------
+        elif mode_primary == 'reading':
+            # Similar to Writing, but focused on summaries/explanation
+            # Clear errors
+            if self.last_error_signature:
+                 self._supersede("mode switch")
+                 self.observer.signals.error_resolved.emit()
+                 self.last_error_signature = None
+
+            # Slightly longer pause for reading; check less frequently to avoid spamming while user reads
+            return self._idle_timer(idle_time, 2.0, 10.0, self.handle_reading_assistance, snapshot, clear_on_typing=False)
+
+        # ---------------------------------------------------------
+        # ---------------------------------------------------------
+        # E. FALLBACK: Visual / Maintenance
+        # ---------------------------------------------------------
+        else:
+            # No error found currently.
+
+            # CRITICAL FIX 3: Conservative Hiding
+            should_hide = False
+            if mode_primary == 'developer':
+                should_hide = True # We are in code, but no error found -> Fixed!
+            elif mode_primary == 'general':
+                should_hide = True # Switched context completely
+
+            if not should_hide:
+                pass # Maintain state
+
+            # Check if we just resolved an error
+            elif self.last_error_signature:
+                print(f"Copilot: Resolving error. Mode={mode_primary} Title='{current_window}'")
+                self.last_error_signature = None
+                self.dismissed_signatures.clear()
+                self.last_visual_sig = None
+                self._supersede("error resolved")
+                self.handle_resolution()
+
+            # Visual Fallback (Only if NOT writing mode, to avoid conflict)
+            # Use Secondary Mode to allow Browser checks but block productive writing
+            elif mode_primary not in ['writing', 'reading']:
+                if self.handle_visual_fallback(snapshot):
+                    # Screen content changes without any event; re-check on a timer
+                    # (static screens are dropped cheaply by the frame change gate)
+                    return config.VISUAL_CHECK_INTERVAL
+
+        return None
+
+    def _idle_timer(self, idle_time, idle_threshold, check_interval, handler, snapshot, clear_on_typing=True):
+        """
+        Idle-threshold timer for writing/reading modes. Runs handler once the user has been
+        idle for idle_threshold seconds (at most every check_interval) and returns the next wake-up.
+        """
+        if idle_time > idle_threshold:
+            # IDLE: Check for suggestions
+            since_check = time.time() - self.last_writing_check_time
+            if since_check > check_interval:
+                handler(snapshot)
+                self.last_writing_check_time = time.time()
+                since_check = 0
+            # A visible suggestion must be cleared soon after typing resumes
+            if clear_on_typing and self.last_visual_sig is not None:
+                return config.TYPING_POLL_INTERVAL
+            return max(0.1, check_interval - since_check)
+
+        # ACTIVE: User is typing -> an analysis of the previous pause is already stale
+        if self.pipeline.is_busy():
+            self._supersede("typing resumed")
+
+        # If we have a lingering suggestion, clear it explicitly
+        if clear_on_typing and self.last_visual_sig is not None:
+             print("Copilot: ⌨️ User resumed typing. Claring suggestion.")
+             self.observer.signals.error_resolved.emit()
+             self.last_visual_sig = None
+
+        # Wake right when the idle threshold will be crossed
+        return max(0.1, idle_threshold - idle_time + 0.05)
 
     def stop(self):
         self.running = False
+        self.post_event('stop')
+        self.pipeline.stop()
+        if self.window_watcher:
+            self.window_watcher.stop()
         self.wait()
 
     def _build_error_payload(self, error, reason="", code="", payload_type="syntax_error"):
@@ -261,15 +364,10 @@ class CopilotController(QThread):
     def handle_new_error(self, snapshot):
         error = snapshot['error']
         print(f"Copilot: 🚨 New Error Detected: {error['message']}")
-        
-        # PHASE 1: Immediate Visual Feedback (includes full error context)
-        temp_payload = self._build_error_payload(
-            error, 
-            reason=f"Analyzing: {error['message']}...",
-            code="# Fetching fix..."
-        )
-        self.observer.signals.suggestion_ready.emit(temp_payload)
-        
+
+        # A different error supersedes any fix still being generated for the old one
+        self._supersede("new error")
+
         # Store proactive context for grounded suggestion execution
         self.last_proactive_context = {
             'mode_primary': snapshot.get('mode_primary', snapshot.get('mode', 'general')),
@@ -283,11 +381,11 @@ class CopilotController(QThread):
             'error_context': error.get('context', ''),
             'file_content': snapshot.get('file_content', ''),
         }
-        
+
         # Construct Prompt — JSON ONLY, no markdown
         error_prompt = f"""You are a strict debugging assistant.
 
-LANGUAGE: Python
+LANGUAGE: {error.get('language', 'Python')}
 
 ERROR:
 File: {error['file']}
@@ -312,35 +410,72 @@ OUTPUT JSON ONLY:
         print(f"Error Context: {error.get('context', '')}")
         print("--- DEBUG PROMPT END ---")
 
+        # Known error (this session or a previous one) -> reuse the fix, no model call
+        cache_key = self.observer.suggestion_cache.key("error", error.get('file', ''), snapshot.get("error_signature"), error.get('context', ''))
+        cached = self.observer.suggestion_cache.get(cache_key)
+        if cached is not None:
+            print("Copilot: Reusing cached fix for this error.")
+            self.deliver_error_fix({'error': error, 'text': cached})
+            return
+
+        # PHASE 1: Immediate Visual Feedback (includes full error context)
+        temp_payload = self._build_error_payload(
+            error,
+            reason=f"Analyzing: {error['message']}...",
+            code="# Fetching fix..."
+        )
+        self.observer.signals.suggestion_ready.emit(temp_payload)
+
+        # PHASE 2: Fix is generated on the inference pipeline (no rate-limit skip needed:
+        # a newer error cancels this request instead of queueing behind it)
+        self.last_llm_call_time = time.time()
+        print("Copilot: Asking LLM for error fix...")
+        self.pipeline.submit('error', self.context_version, self._run_error_fix, error, error_prompt, cache_key)
+
+    def _run_error_fix(self, cancel_event, error, error_prompt, cache_key):
+        """Pipeline job: returns {'error', 'text'} or {'error', 'failure'}; None when superseded."""
         try:
-            import ollama
-            
-            # Rate Limiting (≥1.5s between calls)
-            now = time.time()
-            if now - self.last_llm_call_time < 1.5:
-                print("Copilot: Rate limit hit. Skipping LLM call.")
+            text = self.observer.chat_text([
+                {'role': 'system', 'content': config.DEV_SYSTEM_PROMPT},
+                {'role': 'user', 'content': error_prompt}
+            ], cancel_event)
+            if text is None: return None
+            # Cached even if superseded before delivery: the fix is still right for this error.
+            # Only well-formed fixes: a bad reply would otherwise be replayed for days.
+            payload = self._clean_json(text)
+            if payload and isinstance(payload.get('code'), str) and payload['code'].strip() \
+                    and isinstance(payload.get('reason', ''), str):
+                self.observer.suggestion_cache.put(cache_key, text, config.ERROR_FIX_CACHE_TTL)
+            return {'error': error, 'text': text}
+        except Exception as e:
+            return {'error': error, 'failure': e}
+
+    def deliver_error_fix(self, result):
+        try:
+            error = result['error']
+            if 'failure' in result:
+                e = result['failure']
+                print(f"Copilot LLM Error: {e}")
+                # RECOVERY: Emit fallback so UI doesn't freeze
+                fallback = self._build_error_payload(
+                    error,
+                    reason=f"Error detected: {error['message']}",
+                    code=f"# LLM call failed: {e}"
+                )
+                self.observer.signals.suggestion_ready.emit(fallback)
                 return
 
-            self.last_llm_call_time = now
-            print("Copilot: Asking LLM for error fix...")
-            response = ollama.chat(
-                model=self.observer.model,
-                messages=[
-                    {'role': 'system', 'content': config.DEV_SYSTEM_PROMPT},
-                    {'role': 'user', 'content': error_prompt}
-                ]
-            )
-            text = response['message']['content'].strip()
+            text = result['text']
             print(f"Copilot: LLM Response (Raw): {text[:80]}...")
-            
+
             # Parse JSON
             payload = self._clean_json(text)
             if payload:
                 # Merge with guaranteed structure
                 final = self._build_error_payload(
                     error,
-                    reason=payload.get('reason', error['message']),
-                    code=payload.get('code', '')
+                    reason=str(payload.get('reason', error['message'])),
+                    code=str(payload.get('code', ''))
                 )
                 print(f"Copilot: Payload created (JSON parsed)")
             else:
@@ -352,20 +487,13 @@ OUTPUT JSON ONLY:
                     code=text  # Raw LLM output as code
                 )
                 final['type'] = 'syntax_error'
-            
+
             # Always emit a valid payload
             self.observer.signals.suggestion_ready.emit(final)
             print("Copilot: Signal emitted: suggestion_ready")
-                
+
         except Exception as e:
-            print(f"Copilot LLM Error: {e}")
-            # RECOVERY: Emit fallback so UI doesn't freeze
-            fallback = self._build_error_payload(
-                error,
-                reason=f"Error detected: {error['message']}",
-                code=f"# LLM call failed: {e}"
-            )
-            self.observer.signals.suggestion_ready.emit(fallback)
+            print(f"Copilot Error Fix Handler Error: {e}")
 
     def handle_resolution(self):
         # Emit signal to hide bubble/overlay
@@ -378,7 +506,7 @@ OUTPUT JSON ONLY:
         mode_primary = snapshot.get('mode_primary', 'general')
         mode_secondary = snapshot.get('mode_secondary', 'unknown')
         should_check = False
-        
+
         # Check Strategy based on Secondary Mode
         if mode_secondary in ['terminal', 'browser', 'unknown']:
             should_check = True
@@ -387,100 +515,132 @@ OUTPUT JSON ONLY:
         elif mode_primary in ['developer', 'chat', 'writing', 'reading']:
             # STRICT MODE: Disable visual fallback in clear productive modes
             should_check = False
-                
+
+        if not should_check:
+             return False
+
         if should_check:
              # Rate Limiting (shared 1.5s cooldown)
              now = time.time()
              if now - self.last_llm_call_time < 1.5:
-                 return
+                 return True
+
+             # Still analyzing this context -> let it finish rather than restarting it
+             if self.pipeline.is_busy():
+                 return True
 
-             # Capture via Observer
-             img = self.observer.capture_screen()
              win_title = snapshot.get('window_title', 'Unknown').lower()
-             
+
              # Double Check: If active window is Cora UI, ABORT
              cora_keywords = ["cora", "assistant", "suggestion"]
              if any(kw in win_title for kw in cora_keywords):
-                 return
+                 return False
+
+             # Capture + Analyze on the inference pipeline
+             self.pipeline.submit('visual', self.context_version, self._run_screen_analysis,
+                                  f"Active Window: {win_title}", {'window_title': win_title, 'mode_primary': mode_primary})
+             return True
+
+    def deliver_visual(self, result):
+        try:
+            payload = result['payload']
+            # Store proactive context for grounded suggestion execution
+            self.last_proactive_context = {
+                'mode_primary': result['mode_primary'],
+                'window_title': result['window_title'],
+                'reason': payload.get('reason', ''),
+                'ocr_text': result['ocr_text'],
+                'screenshot': result['screenshot'],
+                'error_file': '', 'error_line': '', 'error_message': '', 'error_context': '',
+                'file_content': '',
+            }
+            self.process_visual_payload(payload)
+
+        except Exception as e:
+            print(f"Copilot Visual Handler Error: {e}")
+
+    def _run_screen_analysis(self, cancel_event, context_text, meta):
+        """
+        Pipeline job shared by visual / writing / reading checks: capture + OCR + vision.
+        Returns meta plus payload and the OCR text / screenshot it was computed from.
+        """
+        img = self.observer.capture_screen()
+        if cancel_event.is_set(): return None
+        payload = self.observer.analyze(img, context_text=context_text, cancel_event=cancel_event)
+        if not payload: return None
+        return dict(meta, payload=payload,
+                    ocr_text=self.observer.last_ocr_text,
+                    screenshot=self.observer.last_proactive_screenshot)
+
+    def handle_writing_assistance(self, snapshot):
+        print("Copilot: ✍️ Writing Pause Detected. Analyzing...")
+        # Rate Limiting (shared 1.5s cooldown)
+        now = time.time()
+        if now - self.last_llm_call_time < 1.5:
+            return
+        if self.pipeline.is_busy():
+            return
+
+        # 1. Capture Screen (Productivity App) + 2. Re-use Observer.analyze for robust OCR + Vision + JSON
+        win_title = snapshot.get('window_title', 'Unknown Application')
+        print(f"Copilot: Analyzing Writing Context in '{win_title}'...")
+        self.pipeline.submit('writing', self.context_version, self._run_screen_analysis,
+                             f"User is writing in {win_title}", {'window_title': win_title, 'mode_primary': 'writing'})
+
+    def deliver_writing(self, result):
+        # 3. Process
+        try:
+             payload = result['payload']
+             print(f"WRITING PAYLOAD: {payload}")
+             confidence = payload.get('confidence', 0.0)
+
+             # 4. Check Thresholds (Lower for writing)
+             if confidence > config.WRITING_THRESHOLD:
+                 payload['type'] = 'writing_suggestion'
+
+                 # Enforce Structure
+                 if 'suggestions' not in payload or not payload['suggestions']:
+                     payload['suggestions'] = [
+                         {"label": "Explain", "hint": "Explain this content"},
+                         {"label": "Summarize", "hint": "Summarize this content"}
+                     ]
 
-             # Analyze
-             payload = self.observer.analyze(img, context_text=f"Active Window: {win_title}")
-             if payload:
                  # Store proactive context for grounded suggestion execution
                  self.last_proactive_context = {
-                     'mode_primary': snapshot.get('mode_primary', snapshot.get('mode', 'general')),
-                     'window_title': win_title,
+                     'mode_primary': 'writing',
+                     'window_title': result['window_title'],
                      'reason': payload.get('reason', ''),
-                     'ocr_text': self.observer.last_ocr_text,
-                     'screenshot': self.observer.last_proactive_screenshot,
+                     'ocr_text': result['ocr_text'],
+                     'screenshot': result['screenshot'],
                      'error_file': '', 'error_line': '', 'error_message': '', 'error_context': '',
                      'file_content': '',
                  }
-                 self.process_visual_payload(payload)
 
-    def handle_writing_assistance(self, snapshot):
-        print("Copilot: ✍️ Writing Pause Detected. Analyzing...")
-        try:
-             # Rate Limiting (shared 1.5s cooldown)
-             now = time.time()
-             if now - self.last_llm_call_time < 1.5:
-                 return
-
-             # 1. Capture Screen (Productivity App)
-             img = self.observer.capture_screen()
-             win_title = snapshot.get('window_title', 'Unknown Application')
-             
-             # 2. Re-use Observer.analyze for robust OCR + Vision + JSON
-             print(f"Copilot: Analyzing Writing Context in '{win_title}'...")
-             payload = self.observer.analyze(img, context_text=f"User is writing in {win_title}")
-             
-             # 3. Process
-             if payload:
-                 print(f"WRITING PAYLOAD: {payload}")
-                 confidence = payload.get('confidence', 0.0)
-                 
-                 # 4. Check Thresholds (Lower for writing)
-                 if confidence > config.WRITING_THRESHOLD:
-                     payload['type'] = 'writing_suggestion'
-                     
-                     # Enforce Structure
-                     if 'suggestions' not in payload or not payload['suggestions']:
-                         payload['suggestions'] = [
-                             {"label": "Explain", "hint": "Explain this content"},
-                             {"label": "Summarize", "hint": "Summarize this content"}
-                         ]
-
-                     # Store proactive context for grounded suggestion execution
-                     self.last_proactive_context = {
-                         'mode_primary': 'writing',
-                         'window_title': win_title,
-                         'reason': payload.get('reason', ''),
-                         'ocr_text': self.observer.last_ocr_text,
-                         'screenshot': self.observer.last_proactive_screenshot,
-                         'error_file': '', 'error_line': '', 'error_message': '', 'error_context': '',
-                         'file_content': '',
-                     }
-
-                     # 5. Deduplicate
-                     reason = payload.get('reason', '')
-                     sig = f"{reason}"
-                     
-                     if sig != self.last_visual_sig and sig not in self.dismissed_signatures:
-                         self.last_visual_sig = sig
-                         print(f"✨ Writing Suggestion: {reason}")
-                         self.observer.signals.suggestion_ready.emit(payload)
-                 else:
-                     print(f"Copilot: Low confidence ({confidence}) writing suggestion.")
-                     
+                 # 5. Deduplicate
+                 reason = payload.get('reason', '')
+                 sig = f"{reason}"
+
+                 if sig != self.last_visual_sig and sig not in self.dismissed_signatures:
+                     self.last_visual_sig = sig
+                     print(f"✨ Writing Suggestion: {reason}")
+                     self.observer.signals.suggestion_ready.emit(payload)
+             else:
+                 print(f"Copilot: Low confidence ({confidence}) writing suggestion.")
+
         except Exception as e:
             print(f"Copilot Writing Handler Error: {e}")
 
-        
+
     def _clean_json(self, text):
         """Extract JSON from LLM response. Returns dict or None."""
+        payload = self._parse_json(text)
+        return payload if isinstance(payload, dict) else None # Bare strings / lists / numbers aren't payloads
+
+    def _parse_json(self, text):
         try:
-            # Strategy 1: Direct parse
-            return json.loads(text)
+            # Strategy 1: Direct parse (a non-object may still wrap one; fall through)
+            payload = json.loads(text)
+            if isinstance(payload, dict): return payload
         except:
             pass
         
@@ -507,55 +667,56 @@ OUTPUT JSON ONLY:
             return None
     def handle_reading_assistance(self, snapshot):
         print("Copilot: 📖 Reading Pause Detected. Analyzing...")
+        # Rate Limiting (shared 1.5s cooldown)
+        now = time.time()
+        if now - self.last_llm_call_time < 1.5:
+            return
+        if self.pipeline.is_busy():
+            return
+
+        # 1. Capture Screen + 2. Re-use Observer.analyze for robust OCR + Vision + JSON
+        win_title = snapshot.get('window_title', 'Unknown Document')
+        print(f"Copilot: Analyzing Reading Context in '{win_title}'...")
+        self.pipeline.submit('reading', self.context_version, self._run_screen_analysis,
+                             f"User is reading document: {win_title}", {'window_title': win_title, 'mode_primary': 'reading'})
+
+    def deliver_reading(self, result):
         try:
-             # Rate Limiting (shared 1.5s cooldown)
-             now = time.time()
-             if now - self.last_llm_call_time < 1.5:
-                 return
-
-             # 1. Capture Screen 
-             img = self.observer.capture_screen()
-             win_title = snapshot.get('window_title', 'Unknown Document')
-
-             # 2. Re-use Observer.analyze for robust OCR + Vision + JSON
-             print(f"Copilot: Analyzing Reading Context in '{win_title}'...")
-             payload = self.observer.analyze(img, context_text=f"User is reading document: {win_title}")
-             
-             if payload:
-                 print(f"READING PAYLOAD: {payload}")
-                 confidence = payload.get('confidence', 0.0)
-                 
-                 if confidence > 0.6: 
-                     payload['type'] = 'reading_suggestion'
-                     
-                     # Ensure we have robust suggestions list
-                     if 'suggestions' not in payload or not payload['suggestions']:
-                         payload['suggestions'] = [
-                             {"label": "Summarize Page", "hint": "Summarize this visible page"},
-                             {"label": "Explain Concepts", "hint": "Explain key concepts on this page"},
-                             {"label": "Key Points", "hint": "Extract bullet points"}
-                         ]
-                     
-                     # Store proactive context for grounded suggestion execution
-                     self.last_proactive_context = {
-                         'mode_primary': 'reading',
-                         'window_title': win_title,
-                         'reason': payload.get('reason', ''),
-                         'ocr_text': self.observer.last_ocr_text,
-                         'screenshot': self.observer.last_proactive_screenshot,
-                         'error_file': '', 'error_line': '', 'error_message': '', 'error_context': '',
-                         'file_content': '',
-                     }
-
-                     reason = payload.get('reason', '')
-                     sig = f"{reason}"
-                     
-                     if sig != self.last_visual_sig and sig not in self.dismissed_signatures:
-                         self.last_visual_sig = sig
-                         print(f"✨ Reading Suggestion: {reason}")
-                         self.observer.signals.suggestion_ready.emit(payload)
-                 else:
-                     print(f"Copilot: Low confidence ({confidence}) reading suggestion.")
-                     
+             payload = result['payload']
+             print(f"READING PAYLOAD: {payload}")
+             confidence = payload.get('confidence', 0.0)
+
+             if confidence > 0.6:
+                 payload['type'] = 'reading_suggestion'
+
+                 # Ensure we have robust suggestions list
+                 if 'suggestions' not in payload or not payload['suggestions']:
+                     payload['suggestions'] = [
+                         {"label": "Summarize Page", "hint": "Summarize this visible page"},
+                         {"label": "Explain Concepts", "hint": "Explain key concepts on this page"},
+                         {"label": "Key Points", "hint": "Extract bullet points"}
+                     ]
+
+                 # Store proactive context for grounded suggestion execution
+                 self.last_proactive_context = {
+                     'mode_primary': 'reading',
+                     'window_title': result['window_title'],
+                     'reason': payload.get('reason', ''),
+                     'ocr_text': result['ocr_text'],
+                     'screenshot': result['screenshot'],
+                     'error_file': '', 'error_line': '', 'error_message': '', 'error_context': '',
+                     'file_content': '',
+                 }
+
+                 reason = payload.get('reason', '')
+                 sig = f"{reason}"
+
+                 if sig != self.last_visual_sig and sig not in self.dismissed_signatures:
+                     self.last_visual_sig = sig
+                     print(f"✨ Reading Suggestion: {reason}")
+                     self.observer.signals.suggestion_ready.emit(payload)
+             else:
+                 print(f"Copilot: Low confidence ({confidence}) reading suggestion.")
+
         except Exception as e:
             print(f"Copilot Reading Handler Error: {e}")
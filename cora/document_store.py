@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import config
+from text_buffer import PieceTable, LineIndex
+
+def doc_key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+class Document:
+    """
+    One editor buffer: path, editor version, piece-table content and derived data
+    (line index, syntax result) that is computed on first use and dropped on edit.
+    """
+    def __init__(self, path, content, version=None):
+        self.path = path
+        self.version = version
+        self.buffer = PieceTable(content)
+        self.updated = time.time()
+        self._line_index = None
+        self.syntax = None # (error, error_signature) for the current content
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def text(self):
+        return self.buffer.text()
+
+    @property
+    def line_index(self):
+        """Line-start offsets over the current text, computed once per content version."""
+        if self._line_index is None:
+            self._line_index = LineIndex(self.text())
+        return self._line_index
+
+    def edit(self, offset, delete_len, text):
+        self.buffer.edit(offset, delete_len, text)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._line_index = None
+        self.syntax = None
+
+class DocumentStore:
+    """
+    Editor buffers keyed by path, so switching tabs never falls back to disk.
+    Least recently used documents are evicted once their total length exceeds max_chars
+    (the active document is never evicted). All access goes through the store lock.
+    """
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars or config.DOCUMENT_STORE_MAX_CHARS
+        self.docs = OrderedDict() # key -> Document
+        self.lock = threading.RLock()
+
+    def get(self, path):
+        if not path: return None
+        with self.lock:
+            doc = self.docs.get(doc_key(path))
+            if doc is not None:
+                self.docs.move_to_end(doc_key(path))
+            return doc
+
+    def put(self, path, content, version=None):
+        """Full sync: replaces the document."""
+        with self.lock:
+            key = doc_key(path)
+            doc = Document(path, content, version)
+            self.docs[key] = doc
+            self.docs.move_to_end(key)
+            self._evict(keep=key)
+            return doc
+
+    def apply(self, path, base_version, version, changes):
+        """
+        Delta sync: applies {'offset', 'length', 'text'} changes in order if the document
+        is at base_version. Returns (applied, current_version).
+        """
+        with self.lock:
+            doc = self.get(path)
+            if doc is None or base_version is None or doc.version != base_version:
+                return False, doc.version if doc else None
+            try:
+                for change in changes:
+                    doc.edit(change['offset'], change['length'], change['text'])
+            except (KeyError, TypeError, ValueError) as e:
+                # Content is now in an unknown state; force the editor to resend it
+                print(f"Document Store: Bad delta for {os.path.basename(path)} ({e}). Requesting resync.")
+                doc.version = None
+                return False, None
+            doc.version = version
+            doc.updated = time.time()
+            self._evict(keep=doc_key(path))
+            return True, version
+
+    def focus(self, path, version):
+        """Tab switch: True if the stored copy is already at the editor's version."""
+        with self.lock:
+            doc = self.get(path)
+            return doc is not None and version is not None and doc.version == version
+
+    def find_by_basename(self, name):
+        name = name.lower()
+        with self.lock:
+            for doc in reversed(self.docs.values()): # Most recently used first
+                if os.path.basename(doc.path).lower() == name:
+                    return doc.path
+        return None
+
+    def remove(self, path):
+        """Editor closed the document: disk is the source of truth again."""
+        with self.lock:
+            return self.docs.pop(doc_key(path), None) is not None
+
+    def total_chars(self):
+        with self.lock:
+            return sum(len(doc) for doc in self.docs.values())
+
+    def _evict(self, keep):
+        total = sum(len(doc) for doc in self.docs.values())
+        for key in list(self.docs):
+            if total <= self.max_chars: break
+            if key == keep: continue
+            total -= len(self.docs.pop(key))
@@ -0,0 +1,82 @@
+import time
+import ctypes
+import platform
+import threading
+
+import config
+
+class ForegroundWindowWatcher(threading.Thread):
+    """
+    Calls on_change() whenever the foreground window (or its title) changes.
+    Uses a WinEvent hook on Windows (no polling); elsewhere polls the title at a low rate.
+    """
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    OBJID_WINDOW = 0
+    WM_QUIT = 0x0012
+
+    def __init__(self, context_engine, on_change, poll_interval=None):
+        super().__init__(name="window-watcher", daemon=True)
+        self.context_engine = context_engine
+        self.on_change = on_change
+        self.poll_interval = poll_interval or config.WINDOW_POLL_INTERVAL
+        self.running = True
+        self._thread_id = None
+        self._proc = None # Keep the ctypes callback alive while hooked
+
+    def run(self):
+        if platform.system() == "Windows":
+            try:
+                self._run_hook()
+                return
+            except Exception as e:
+                print(f"Window Watcher: WinEvent hook failed ({e}), polling instead.")
+        self._run_polling()
+
+    def _run_hook(self):
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+                                           wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+
+        def callback(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+            # Title changes only matter for the foreground window itself (e.g. editor tab switch)
+            if event == self.EVENT_SYSTEM_FOREGROUND or (
+                    id_object == self.OBJID_WINDOW and hwnd == user32.GetForegroundWindow()):
+                self.on_change()
+
+        self._proc = WinEventProc(callback)
+        hooks = [user32.SetWinEventHook(event, event, 0, self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT)
+                 for event in (self.EVENT_SYSTEM_FOREGROUND, self.EVENT_OBJECT_NAMECHANGE)]
+        if not all(hooks):
+            raise OSError("SetWinEventHook returned NULL")
+
+        # Out-of-context hooks are delivered through this thread's message loop
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        msg = wintypes.MSG()
+        try:
+            while self.running and user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in hooks:
+                user32.UnhookWinEvent(hook)
+
+    def _run_polling(self):
+        last_title = None
+        while self.running:
+            title = self.context_engine.get_active_window_title()
+            if title != last_title:
+                last_title = title
+                self.on_change()
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        self.running = False
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
@@ -0,0 +1,210 @@
+import os
+import time
+import heapq
+import threading
+
+import config
+
+# Optional: native filesystem events (falls back to a slow polling rescan)
+try:
+    from watchdog.observers import Observer as WatchdogObserver
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    WatchdogObserver = None
+    FileSystemEventHandler = object
+
+SKIP_DIRS = {'.git', 'venv', '__pycache__', 'node_modules'}
+
+class _IndexEventHandler(FileSystemEventHandler):
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    # Directory events arrive once for the whole subtree, not per contained file
+    def on_created(self, event):
+        if event.is_directory: self.index.scan_tree(event.src_path)
+        else: self.index.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory: self.index.touch(event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory: self.index.remove_tree(event.src_path)
+        else: self.index.remove(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.index.remove_tree(event.src_path)
+            self.index.scan_tree(event.dest_path)
+        else:
+            self.index.remove(event.src_path)
+            self.index.touch(event.dest_path)
+
+class FileIndex:
+    """
+    Workspace file index, seeded once with os.walk and then kept current from
+    watchdog events (or a periodic rescan when watchdog is unavailable).
+    Keeps a lazy max-heap of (mtime, path) per extension, so most-recently-modified
+    lookups only peek at heap tops instead of walking the tree.
+    """
+    def __init__(self, roots, poll_interval=None, on_change=None):
+        # Drop roots nested inside another root (the parent walk already covers them)
+        roots = [os.path.abspath(r) for r in roots]
+        self.roots = [r for r in roots if not any(r != o and r.startswith(o + os.sep) for o in roots)]
+        self.ignored = [os.path.abspath(d) for d in config.APP_DATA_DIRS] # Cora's cache / chat files
+        self.poll_interval = poll_interval or config.FILE_INDEX_POLL_INTERVAL
+        self.on_change = on_change # Called with the path of every created/modified/deleted file
+
+        self.lock = threading.Lock()
+        self.mtimes = {} # path -> mtime
+        self.heaps = {}  # ext -> [(-mtime, path)], may hold stale entries
+        self.counts = {} # ext -> live file count
+        self.by_name = {} # lowercase basename -> set of paths
+        self.workspace_root = roots[0] if roots else None # Ranking anchor for name lookups
+        self.ready = threading.Event()
+        self.observer = None
+
+    def start(self):
+        threading.Thread(target=self._run, name="file-index", daemon=True).start()
+
+    def _skipped(self, path):
+        if any(part in SKIP_DIRS for part in path.split(os.sep)): return True
+        path = os.path.abspath(path)
+        return any(path == d or path.startswith(d + os.sep) for d in self.ignored)
+
+    def _walk(self, roots=None):
+        found = {}
+        for root_path in roots or self.roots:
+            for root, dirs, files in os.walk(root_path):
+                dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not self._skipped(os.path.join(root, d))]
+                for file in files:
+                    full_path = os.path.join(root, file)
+                    try:
+                        found[full_path] = os.path.getmtime(full_path)
+                    except OSError:
+                        continue
+        return found
+
+    def _run(self):
+        # 1. Seed
+        start = time.time()
+        for path, mtime in self._walk().items():
+            self._set(path, mtime)
+        self.ready.set()
+        print(f"File Index: {len(self.mtimes)} files indexed in {time.time() - start:.2f}s")
+
+        # 2. Keep current
+        if WatchdogObserver:
+            try:
+                self.observer = WatchdogObserver()
+                handler = _IndexEventHandler(self)
+                for root_path in self.roots:
+                    self.observer.schedule(handler, root_path, recursive=True)
+                self.observer.daemon = True
+                self.observer.start()
+                return
+            except Exception as e:
+                print(f"File Index: watchdog unavailable ({e}), polling instead.")
+
+        while True:
+            time.sleep(self.poll_interval)
+            found = self._walk()
+            for path in set(self.mtimes) - set(found):
+                self.remove(path)
+            for path, mtime in found.items():
+                if self.mtimes.get(path) != mtime:
+                    self._set(path, mtime)
+                    self._changed(path)
+
+    def _changed(self, path):
+        if self.on_change and self.ready.is_set():
+            try:
+                self.on_change(path)
+            except Exception as e:
+                print(f"File Index: listener error: {e}")
+
+    def _set(self, path, mtime):
+        ext = os.path.splitext(path)[1]
+        with self.lock:
+            if path not in self.mtimes:
+                self.counts[ext] = self.counts.get(ext, 0) + 1
+                self.by_name.setdefault(os.path.basename(path).lower(), set()).add(path)
+            self.mtimes[path] = mtime
+            heap = self.heaps.setdefault(ext, [])
+            heapq.heappush(heap, (-mtime, path))
+            # Compact when stale entries dominate (repeated saves of the same file)
+            if len(heap) > 2 * self.counts[ext] + 64:
+                heap = [(-m, p) for p, m in self.mtimes.items() if os.path.splitext(p)[1] == ext]
+                heapq.heapify(heap)
+                self.heaps[ext] = heap
+
+    def touch(self, path):
+        """Records a created/modified file."""
+        if self._skipped(path): return
+        try:
+            self._set(path, os.path.getmtime(path))
+            self._changed(path)
+        except OSError:
+            self.remove(path)
+
+    def remove(self, path):
+        with self.lock:
+            removed = self.mtimes.pop(path, None) is not None # Heap entries become stale, dropped lazily
+            if removed:
+                ext = os.path.splitext(path)[1]
+                self.counts[ext] -= 1
+                name = os.path.basename(path).lower()
+                paths = self.by_name.get(name)
+                if paths:
+                    paths.discard(path)
+                    if not paths: del self.by_name[name]
+        if removed:
+            self._changed(path)
+
+    def scan_tree(self, dir_path):
+        """Indexes every file under a created / moved-in directory."""
+        if self._skipped(dir_path): return
+        for path, mtime in self._walk([dir_path]).items():
+            self._set(path, mtime)
+            self._changed(path)
+
+    def remove_tree(self, dir_path):
+        """Drops every indexed file under a deleted / moved-away directory."""
+        prefix = dir_path.rstrip(os.sep) + os.sep
+        with self.lock:
+            paths = [p for p in self.mtimes if p.startswith(prefix)]
+        for path in paths:
+            self.remove(path)
+
+    def most_recent(self, extensions):
+        """Most recently modified file with one of the given extensions, or None."""
+        best_path, best_mtime = None, None
+        with self.lock:
+            for ext in extensions:
+                heap = self.heaps.get(ext)
+                # Pop stale tops (deleted files / superseded mtimes)
+                while heap and self.mtimes.get(heap[0][1]) != -heap[0][0]:
+                    heapq.heappop(heap)
+                if heap and (best_mtime is None or -heap[0][0] > best_mtime):
+                    best_mtime, best_path = -heap[0][0], heap[0][1]
+        return best_path
+
+    def _depth(self, path):
+        # Directory hops from the workspace root (paths outside it rank last)
+        if self.workspace_root and (path + os.sep).startswith(self.workspace_root + os.sep):
+            return os.path.relpath(path, self.workspace_root).count(os.sep)
+        return float('inf')
+
+    def resolve(self, basename):
+        """
+        Paths whose file name matches `basename` (case-insensitive), best first:
+        most recently modified, then closest to the workspace root.
+        """
+        with self.lock:
+            paths = list(self.by_name.get(basename.lower(), ()))
+            mtimes = {p: self.mtimes.get(p, 0) for p in paths}
+        return sorted(paths, key=lambda p: (-mtimes[p], self._depth(p)))
+
+    def stop(self):
+        if self.observer:
+            self.observer.stop()
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+import payload_encoder
+
+class Frame:
+    """
+    A single screen capture.
+    Holds the raw mss BGRA buffer as a zero-copy numpy view and derives the
+    OCR grayscale array and the model payload lazily (each at most once).
+    """
+    def __init__(self, sct_img, max_side=None):
+        self.width, self.height = sct_img.size
+        self.max_side = max_side or config.CAPTURE_MAX_SIDE
+        self._raw = sct_img.raw # Keep the buffer alive for the view below
+        self.bgra = np.frombuffer(self._raw, dtype=np.uint8).reshape(self.height, self.width, 4)
+
+        self._gray = None
+        self._payload = None
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def _target_size(self):
+        # Downscale for performance, but KEEP READABLE (same bound as the old thumbnail)
+        scale = min(1.0, self.max_side / max(self.width, self.height))
+        return (max(1, int(self.width * scale)), max(1, int(self.height * scale)))
+
+    @property
+    def gray(self):
+        """Single-channel uint8 array for OCR, bounded to max_side."""
+        if self._gray is None:
+            gray = cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2GRAY)
+            target = self._target_size()
+            if target != self.size:
+                gray = cv2.resize(gray, target, interpolation=cv2.INTER_AREA)
+            self._gray = gray
+        return self._gray
+
+    @property
+    def payload(self):
+        """Compressed image bytes for the vision model (sized from the full-resolution buffer)."""
+        if self._payload is None:
+            self._payload = payload_encoder.get_encoder().encode(self)
+        return self._payload
+
+    def downsample(self, size):
+        """Tiny grayscale copy (PIL 'L') for change detection."""
+        return Image.fromarray(cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA))
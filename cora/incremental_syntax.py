@@ -0,0 +1,84 @@
+import ast
+import re
+from collections import OrderedDict
+
+# Column-0 heads that start an independently parseable top-level block
+_BLOCK_START = re.compile(r'^(?:@|(?:async[ \t]+)?def[ \t]|class[ \t])', re.M)
+
+class IncrementalPythonChecker:
+    """
+    Region-scoped syntax checking for large Python buffers.
+    Content is split at top-level def/class boundaries and only blocks that were not
+    already known-good are parsed. Any failing block triggers one full parse, which
+    yields the exact error (with correct line numbers) and detects bad splits, e.g.
+    a column-0 'def' inside a triple-quoted string.
+    """
+    def __init__(self, max_files=32):
+        self.max_files = max_files
+        self.states = OrderedDict() # path -> {'good', 'structure', 'untrusted'}
+
+    def _prev_line(self, content, pos):
+        # Previous non-blank line before offset pos
+        end = pos - 1
+        while end > 0:
+            start = content.rfind('\n', 0, end) + 1
+            line = content[start:end]
+            if line.strip():
+                return line
+            end = start - 1
+        return ""
+
+    def split(self, content):
+        """Returns the list of top-level block strings (decorators stay with their def/class)."""
+        cuts = [0]
+        for match in _BLOCK_START.finditer(content):
+            pos = match.start()
+            if pos == 0: continue
+            if self._prev_line(content, pos).startswith('@'): continue
+            cuts.append(pos)
+        cuts.append(len(content))
+        return [content[a:b] for a, b in zip(cuts, cuts[1:])]
+
+    def check(self, path, content):
+        """
+        Same contract as ast.parse(content): returns None, raises SyntaxError.
+        """
+        blocks = self.split(content)
+        structure = tuple(block.split('\n', 1)[0] for block in blocks)
+        state = self.states.get(path)
+
+        # Known-bad split for this exact block structure -> full parse only
+        if state and state['untrusted'] and state['structure'] == structure:
+            ast.parse(content)
+            return None
+
+        good = state['good'] if state else set()
+        new_good = set()
+        failed = False
+        for block in blocks:
+            h = hash(block)
+            if h in good:
+                new_good.add(h)
+                continue
+            try:
+                ast.parse(block)
+                new_good.add(h)
+            except SyntaxError:
+                failed = True
+                break
+
+        if failed:
+            # Raises with accurate line numbers if the buffer is really broken
+            ast.parse(content)
+            # Whole buffer parses -> the split was wrong, stop trusting it until structure changes
+            self._store(path, {'good': set(), 'structure': structure, 'untrusted': True})
+            return None
+
+        self._store(path, {'good': new_good, 'structure': structure, 'untrusted': False})
+        return None
+
+    def _store(self, path, state):
+        self.states[path] = state
+        self.states.move_to_end(path)
+        if len(self.states) > self.max_files:
+            self.states.popitem(last=False)
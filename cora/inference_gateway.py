@@ -0,0 +1,287 @@
+import time
+import threading
+import ollama
+
+import config
+
+# Priority classes (lower runs first)
+PRIORITY_INTERACTIVE = 0 # User chat: never waits behind speculative work
+PRIORITY_PROACTIVE = 1   # Screen / error analysis
+PRIORITY_BACKGROUND = 2  # Session titles and other housekeeping
+
+class InferenceCancelled(Exception):
+    """Raised when a queued or streaming call is cancelled by its caller or preempted by higher-priority work."""
+    def __init__(self, preempted=False):
+        super().__init__("preempted" if preempted else "cancelled")
+        self.preempted = preempted
+
+class Lease:
+    def __init__(self, model, priority, label):
+        self.model = model
+        self.priority = priority
+        self.label = label
+        self.enqueued = time.time()
+        self.granted = None
+        self.preempt_event = threading.Event()
+
+class InferenceScheduler:
+    """
+    Admission control in front of the Ollama server. Each model runs at most
+    max_concurrency calls at once; waiters are served by priority class, FIFO
+    within a class, and a waiter's class improves by one per aging_seconds (up to
+    proactive, never interactive) so background work cannot starve. Models share the
+    GPU, so an interactive arrival preempts running lower-priority streams on every
+    model, and lower-priority work is not admitted while interactive work is queued or
+    running. The gateway aborts preempted requests at once, even mid-prefill.
+    """
+    def __init__(self, max_concurrency=None, aging_seconds=None):
+        self.max_concurrency = max_concurrency or config.OLLAMA_MAX_CONCURRENCY
+        self.aging_seconds = aging_seconds or config.INFERENCE_AGING_SECONDS
+        self.cond = threading.Condition()
+        self.waiting = [] # Leases in arrival order
+        self.running = {} # model -> set of leases
+
+    def _rank(self, lease, now):
+        aged = int((now - lease.enqueued) / self.aging_seconds)
+        # Aged speculative work never ties user chat (it would then win on arrival time)
+        floor = PRIORITY_INTERACTIVE if lease.priority == PRIORITY_INTERACTIVE else PRIORITY_PROACTIVE
+        return (max(floor, lease.priority - aged), lease.enqueued)
+
+    def _next_for(self, model):
+        now = time.time()
+        candidates = [l for l in self.waiting if l.model == model]
+        return min(candidates, key=lambda l: self._rank(l, now)) if candidates else None
+
+    def _interactive_active(self):
+        return any(l.priority == PRIORITY_INTERACTIVE for l in self.waiting) or \
+            any(l.priority == PRIORITY_INTERACTIVE for leases in self.running.values() for l in leases)
+
+    def _admissible(self, lease, running):
+        if len(running) >= self.max_concurrency or self._next_for(lease.model) is not lease:
+            return False
+        return lease.priority == PRIORITY_INTERACTIVE or not self._interactive_active()
+
+    def acquire(self, model, priority, label, cancel_event=None):
+        lease = Lease(model, priority, label)
+        with self.cond:
+            self.waiting.append(lease)
+            running = self.running.setdefault(model, set())
+            if priority == PRIORITY_INTERACTIVE:
+                for leases in self.running.values():
+                    for other in leases:
+                        if other.priority > priority and not other.preempt_event.is_set():
+                            print(f"Inference Scheduler: [{label}] preempting [{other.label}] on {other.model}.")
+                            other.preempt_event.set()
+            try:
+                while not self._admissible(lease, running):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise InferenceCancelled()
+                    # Timed wait: aging and caller cancellation need re-checks without a notify
+                    self.cond.wait(timeout=0.25)
+            finally:
+                self.waiting.remove(lease)
+                self.cond.notify_all()
+            lease.granted = time.time()
+            running.add(lease)
+        return lease
+
+    def release(self, lease):
+        with self.cond:
+            self.running.get(lease.model, set()).discard(lease)
+            self.cond.notify_all()
+
+    def queue_depth(self):
+        with self.cond:
+            return len(self.waiting)
+
+class InferenceGateway:
+    """
+    Single entry point for model calls. Owns one ollama.Client (a pooled HTTP
+    connection to the server) and sends keep_alive on every request so configured
+    models stay resident between proactive calls instead of being cold-loaded.
+    Per-call latency, time-to-first-token and model load time are recorded per label.
+    """
+    def __init__(self, host=None, keep_alive=None):
+        self.host = host or config.OLLAMA_HOST
+        self.keep_alive = config.OLLAMA_KEEP_ALIVE if keep_alive is None else keep_alive
+        self.client = ollama.Client(host=self.host, timeout=config.OLLAMA_TIMEOUT)
+        self.scheduler = InferenceScheduler()
+        self.lock = threading.Lock()
+        self.metrics = {} # label -> aggregate stats
+        self.failed_models = set() # Models whose warm-up failed (not pulled / not loadable)
+        self.idle_clients = [] # Reusable connections for preemptible streams (guarded by lock)
+
+    # -----------------------------------------------------------------
+    # Residency
+    # -----------------------------------------------------------------
+    def warm_up(self, models=None):
+        """Loads models into memory ahead of the first real request (empty prompt = load only)."""
+        for model in models or config.OLLAMA_RESIDENT_MODELS:
+            start = time.time()
+            try:
+                response = self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+                load = (response.get('load_duration') or 0) / 1e9
+                self.failed_models.discard(model)
+                print(f"Inference Gateway: {model} resident (load {load:.2f}s, total {time.time() - start:.2f}s).")
+            except Exception as e:
+                self.failed_models.add(model)
+                print(f"Inference Gateway: Warm-up of {model} failed: {e}")
+
+    def is_available(self, model):
+        """False once warm-up of the model failed (optional routes should skip it)."""
+        return model not in self.failed_models
+
+    def warm_up_async(self, models=None):
+        t = threading.Thread(target=self.warm_up, args=(models,), name="ollama-warmup", daemon=True)
+        t.start()
+        return t
+
+    # -----------------------------------------------------------------
+    # Calls
+    # -----------------------------------------------------------------
+    def chat(self, model, messages, stream=False, label="chat", priority=PRIORITY_INTERACTIVE,
+             cancel_event=None, **kwargs):
+        """
+        Drop-in for ollama.chat, admitted through the scheduler. A stream is returned as a
+        generator that holds its slot until exhausted or closed, and raises InferenceCancelled
+        if cancel_event is set or the call is preempted. Blocking calls are never preempted,
+        so lower-priority work should stream.
+        """
+        kwargs.setdefault('keep_alive', self.keep_alive)
+        lease = self.scheduler.acquire(model, priority, label, cancel_event)
+        if not stream:
+            try:
+                response = self.client.chat(model=model, messages=messages, **kwargs)
+            finally:
+                self.scheduler.release(lease)
+            self._record(label, lease, time.time(), response)
+            return response
+        return self._stream(model, messages, lease, cancel_event, kwargs)
+
+    def _stream(self, model, messages, lease, cancel_event, kwargs):
+        first_token = None
+        final = None
+        # Preemptible streams get a connection of their own from a small pool: closing it aborts
+        # the request server-side, even during prompt / image prefill before the first token
+        preemptible = lease.priority > PRIORITY_INTERACTIVE
+        client = self._checkout_client() if preemptible else self.client
+        finished = threading.Event()
+        aborted = threading.Event()
+        abort_lock = threading.Lock()
+        if preemptible:
+            threading.Thread(target=self._abort_when_cancelled,
+                             args=(client, lease, cancel_event, finished, aborted, abort_lock),
+                             name="ollama-abort", daemon=True).start()
+        try:
+            stream = client.chat(model=model, messages=messages, stream=True, **kwargs)
+            try:
+                for chunk in stream:
+                    self._raise_if_cancelled(lease, cancel_event)
+                    if first_token is None:
+                        first_token = time.time()
+                    if chunk.get('done'):
+                        final = chunk
+                    yield chunk
+            except InferenceCancelled:
+                raise
+            except Exception:
+                # Connection closed by _abort_when_cancelled -> report it as the cancellation it is
+                self._raise_if_cancelled(lease, cancel_event)
+                raise
+            finally:
+                stream.close()
+        finally:
+            with abort_lock:
+                finished.set()
+            if preemptible:
+                self._checkin_client(client, aborted.is_set())
+            self.scheduler.release(lease)
+            # final is None when the consumer stopped early (cancelled / preempted / user stop)
+            self._record(lease.label, lease, first_token, final)
+
+    @staticmethod
+    def _raise_if_cancelled(lease, cancel_event):
+        if lease.preempt_event.is_set():
+            raise InferenceCancelled(preempted=True)
+        if cancel_event is not None and cancel_event.is_set():
+            raise InferenceCancelled()
+
+    def _checkout_client(self):
+        with self.lock:
+            if self.idle_clients:
+                return self.idle_clients.pop()
+        return ollama.Client(host=self.host, timeout=config.OLLAMA_TIMEOUT)
+
+    def _checkin_client(self, client, aborted):
+        # An aborted client's connection is closed for good -> drop it instead of pooling it
+        if not aborted:
+            with self.lock:
+                if len(self.idle_clients) < config.OLLAMA_PREEMPTIBLE_CLIENTS:
+                    self.idle_clients.append(client)
+                    return
+        self._close_client(client)
+
+    @staticmethod
+    def _close_client(client):
+        http = getattr(client, '_client', None)
+        if http is not None:
+            http.close()
+
+    @classmethod
+    def _abort_when_cancelled(cls, client, lease, cancel_event, finished, aborted, abort_lock):
+        while not finished.wait(0.1):
+            if lease.preempt_event.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                # Closing the connection unblocks a pending read; skipped if the stream already
+                # finished and the client went back to the pool
+                with abort_lock:
+                    if finished.is_set():
+                        return
+                    aborted.set()
+                cls._close_client(client)
+                return
+
+    def _record(self, label, lease, first_token, response):
+        model, start = lease.model, lease.granted
+        wait = start - lease.enqueued
+        latency = time.time() - start
+        ttft = (first_token - start) if first_token else None
+        load = ((response.get('load_duration') or 0) / 1e9) if response else 0.0
+        with self.lock:
+            m = self.metrics.setdefault(label, {
+                'calls': 0, 'cancelled': 0, 'total_latency': 0.0, 'total_load': 0.0, 'total_wait': 0.0,
+                'cold_loads': 0, 'last_latency': 0.0, 'last_load': 0.0, 'last_ttft': None,
+            })
+            m['calls'] += 1
+            m['cancelled'] += response is None
+            m['total_latency'] += latency
+            m['total_load'] += load
+            m['total_wait'] += wait
+            m['cold_loads'] += load > config.OLLAMA_COLD_LOAD_THRESHOLD
+            m['last_latency'], m['last_load'], m['last_ttft'] = latency, load, ttft
+
+        status = "cancelled" if response is None else f"load {load:.2f}s"
+        ttft_text = f", first token {ttft:.2f}s" if ttft is not None else ""
+        wait_text = f", queued {wait:.2f}s" if wait >= 0.05 else ""
+        print(f"Inference Gateway: [{label}] {model} {latency:.2f}s ({status}{ttft_text}{wait_text})")
+
+    def stats(self):
+        """Snapshot of per-label metrics, with averages."""
+        with self.lock:
+            out = {}
+            for label, m in self.metrics.items():
+                out[label] = dict(m,
+                                  avg_latency=m['total_latency'] / m['calls'],
+                                  avg_load=m['total_load'] / m['calls'],
+                                  avg_wait=m['total_wait'] / m['calls'])
+            return out
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """Shared gateway (created on first use)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = InferenceGateway()
+        return _gateway
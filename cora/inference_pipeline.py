@@ -0,0 +1,86 @@
+import threading
+from PyQt6.QtCore import QObject, pyqtSignal
+
+class InferenceJob:
+    def __init__(self, kind, version, fn, args):
+        self.kind = kind
+        self.version = version
+        self.fn = fn
+        self.args = args
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+class InferencePipeline(QObject):
+    """
+    Runs proactive inference off the copilot thread with latest-wins semantics.
+    There is one running job and one pending slot: submitting a job cancels the
+    running one and replaces whatever was pending. Job functions receive the
+    job's cancel Event as their first argument and should return early once it is set.
+    Results of jobs that were not cancelled are emitted as (kind, version, result).
+    """
+    result_ready = pyqtSignal(str, int, object)
+
+    def __init__(self):
+        super().__init__()
+        self.cond = threading.Condition()
+        self.pending = None
+        self.current = None
+        self.running = True
+        self.worker = threading.Thread(target=self._run, name="inference-pipeline", daemon=True)
+        self.worker.start()
+
+    def submit(self, kind, version, fn, *args):
+        job = InferenceJob(kind, version, fn, args)
+        with self.cond:
+            # Latest wins: stale work is dropped before it costs a model call
+            if self.pending:
+                self.pending.cancel_event.set()
+            if self.current:
+                self.current.cancel_event.set()
+            self.pending = job
+            self.cond.notify()
+        return job
+
+    def cancel(self):
+        """Cancels queued and in-flight work (e.g. the error it was for was fixed)."""
+        with self.cond:
+            if self.pending:
+                self.pending.cancel_event.set()
+                self.pending = None
+            if self.current:
+                self.current.cancel_event.set()
+
+    def is_busy(self):
+        with self.cond:
+            return self.current is not None or self.pending is not None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and self.pending is None:
+                    self.cond.wait()
+                if not self.running: return
+                job, self.pending = self.pending, None
+                self.current = job
+
+            try:
+                result = job.fn(job.cancel_event, *job.args)
+            except Exception as e:
+                print(f"Inference Pipeline: {job.kind} job failed: {e}")
+                result = None
+
+            with self.cond:
+                self.current = None
+            if job.cancelled:
+                print(f"Inference Pipeline: {job.kind} job v{job.version} superseded, result dropped.")
+                continue
+            self.result_ready.emit(job.kind, job.version, result)
+
+    def stop(self):
+        self.cancel()
+        with self.cond:
+            self.running = False
+            self.cond.notify()
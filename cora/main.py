@@ -73,6 +73,9 @@ class CoraApp:
         self.observer.signals.prepare_capture.connect(self.hide_ui_for_capture)
         self.observer.signals.finished_capture.connect(self.restore_ui_after_capture)
         self.observer.signals.error_resolved.connect(self.bubble.hide_bubble)
+
+        # Pre-warm: load the model now so the first suggestion doesn't pay the cold load
+        self.observer.gateway.warm_up_async()
         
         # Bridge Server (VS Code Integration)
         import bridge_server
@@ -1,6 +1,5 @@
 import time
 import mss
-import ollama
 import threading
 from PIL import Image
 import io
@@ -10,6 +9,13 @@ import json
 import re
 import context_engine
 import ocr_engine
+import attachment_reader
+import attachment_cache
+import change_detector
+import inference_gateway
+import suggestion_cache
+import payload_encoder
+from frame import Frame
 from PyQt6.QtCore import QObject, pyqtSignal
 
 class ObserverSignal(QObject):
@@ -25,15 +31,20 @@ class Observer:
         self.stop_flag = False
         self.signals = ObserverSignal()
         self.model = config.OLLAMA_MODEL 
+        self.gateway = inference_gateway.get_gateway()
         self.context_engine = context_engine.ContextEngine()
         self.last_llm_call_time = 0
+        self.change_detector = change_detector.FrameChangeDetector()
+        self.tiled_ocr = ocr_engine.TiledOCR()
+        self.attachment_cache = attachment_cache.AttachmentCache()
+        self.suggestion_cache = suggestion_cache.SuggestionCache()
         
         # Proactive context storage (for grounded suggestion execution)
         self.last_ocr_text = ""
         self.last_proactive_screenshot = None  # bytes
         
         # Session Management
-        self.chats_dir = os.path.join(os.getcwd(), "chats")
+        self.chats_dir = config.CHATS_DIR
         if not os.path.exists(self.chats_dir):
             os.makedirs(self.chats_dir)
             
@@ -154,26 +165,43 @@ class Observer:
             time.sleep(0.3) # Give UI time to vanish
             
             with mss.mss() as sct:
-                monitor = sct.monitors[1]
+                monitor = self._capture_region(sct)
                 sct_img = sct.grab(monitor)
-                img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-                # Downscale for performance, but KEEP READABLE
-                img.thumbnail((3000, 3000)) # Increased from 2048 to preserve text
+                # Zero-copy wrap; grayscale / payload are derived lazily on demand
+                frame = Frame(sct_img)
                 
             # 2. Restore UI
             self.signals.finished_capture.emit()
-            return img
+            return frame
             
         except Exception as e:
             print(f"Screen Capture Error: {e}")
             self.signals.finished_capture.emit() # Always restore
             return None
 
+    def _capture_region(self, sct):
+        """
+        Picks the grab rectangle: the active window (clamped to the desktop) in
+        'window' mode, else the primary monitor. Falls back to the full monitor
+        whenever the window rect is unavailable or too small to be useful.
+        """
+        if config.CAPTURE_MODE == "window":
+            rect = self.context_engine.get_active_window_rect()
+            if rect:
+                desktop = sct.monitors[0] # Bounding box of all monitors
+                left = max(rect[0], desktop['left'])
+                top = max(rect[1], desktop['top'])
+                right = min(rect[0] + rect[2], desktop['left'] + desktop['width'])
+                bottom = min(rect[1] + rect[3], desktop['top'] + desktop['height'])
+                if right - left >= config.CAPTURE_MIN_WINDOW_SIZE and bottom - top >= config.CAPTURE_MIN_WINDOW_SIZE:
+                    return {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+        return sct.monitors[1]
+
     def _image_to_bytes(self, image):
         if not image: return None
-        with io.BytesIO() as output:
-            image.save(output, format='PNG') # PNG is lossless, better for text
-            return output.getvalue()
+        if isinstance(image, bytes): return image
+        if isinstance(image, Frame): return image.payload # Encoded once, cached on the frame
+        return payload_encoder.get_encoder().encode(image)
 
     def pause(self):
         self.paused = True
@@ -183,7 +211,7 @@ class Observer:
         self.paused = False
         print("Observer Resumed.")
 
-    def analyze(self, image_data, context_text=""):
+    def analyze(self, image_data, context_text="", cancel_event=None):
         if self.paused or not image_data: return None
         
         # Self-analysis guard: skip if current window is Cora UI
@@ -194,19 +222,25 @@ class Observer:
         except:
             pass
         
-        # Convert to bytes if PIL Image
-        # Convert to bytes if PIL Image
+        # Rate Limiting (checked before any OCR work)
+        if time.time() - self.last_llm_call_time < 1.5:
+            return None
+
+        # Change Gate: static screen -> nothing new to say, skip OCR + LLM
+        frame_signature = None
         if not isinstance(image_data, bytes):
-            image_data = self._image_to_bytes(image_data)
-        
+            changed, frame_signature = self.change_detector.check(image_data)
+            if not changed:
+                return None
+
         # -----------------------------------------------------------------
         # HYBRID PERCEPTION: OCR + VISION
         # -----------------------------------------------------------------
         ocr_text = ""
         try:
-             # Re-convert bytes back to PIL for OCR (inefficient but safe for now)
-             ocr_img = Image.open(io.BytesIO(image_data))
-             ocr_text = ocr_engine.extract_text(ocr_img)
+             # Frames / PIL images go straight to OCR; only raw bytes need decoding
+             ocr_img = Image.open(io.BytesIO(image_data)) if isinstance(image_data, bytes) else image_data
+             ocr_text = self.tiled_ocr.extract_text(ocr_img)
              if len(ocr_text) < 20: 
                  ocr_text = "" # Ignore noise
              else:
@@ -215,11 +249,30 @@ class Observer:
         except Exception as e:
              print(f"OCR Pipeline Error: {e}")
         
+        # Superseded while OCR ran -> don't spend a model call on stale context
+        if cancel_event is not None and cancel_event.is_set(): return None
+
+        # Model payload (encoded at most once per frame)
+        image_data = self._image_to_bytes(image_data)
+
         # Store for suggestion execution pipeline
         self.last_ocr_text = ocr_text
         self.last_proactive_screenshot = image_data
 
-        # Add Context to Prompt
+        # Response Cache: same window + same text -> same answer (only when grounded in OCR)
+        cache_key = self.suggestion_cache.key("analyze", suggestion_cache.normalize_screen(context_text),
+                                              suggestion_cache.normalize_screen(ocr_text)) if ocr_text else None
+        if cache_key:
+            cached = self.suggestion_cache.get(cache_key)
+            if cached is not None:
+                print(f"Observer: Suggestion cache hit for '{context_text}'.")
+                self.change_detector.commit(frame_signature)
+                return cached
+
+        # Routing: well-recognized text goes to the small text model, skipping vision prefill
+        text_only, route_reason = self._route(ocr_text)
+        print(f"Observer: Route={'text' if text_only else 'vision'} ({route_reason})")
+
         # Add Context to Prompt
         full_prompt = f"""
         You are a grounded screen assistant.
@@ -244,18 +297,27 @@ class Observer:
         """
         
         try:
-            # Rate Limiting
-            now = time.time()
-            if now - self.last_llm_call_time < 1.5:
-                return None
-            self.last_llm_call_time = now
-
-            # Use general SYSTEM_PROMPT for visual analysis (Productivity/Terminal)
-            response = ollama.chat(model=self.model, messages=[
-                {'role': 'system', 'content': config.SYSTEM_PROMPT},
-                {'role': 'user', 'content': full_prompt, 'images': [image_data]}
-            ])
-            text = response['message']['content'].strip()
+            self.last_llm_call_time = time.time()
+
+            if text_only:
+                try:
+                    text = self.chat_text([
+                        {'role': 'system', 'content': config.TEXT_SYSTEM_PROMPT},
+                        {'role': 'user', 'content': full_prompt}
+                    ], cancel_event, model=config.OLLAMA_TEXT_MODEL)
+                except Exception as e:
+                    # Model missing / failing: this screen still gets analyzed, by vision
+                    print(f"Observer: Text route failed ({e}). Falling back to vision.")
+                    if getattr(e, 'status_code', None) == 404: # Model not pulled: stop routing to it
+                        self.gateway.failed_models.add(config.OLLAMA_TEXT_MODEL)
+                    text_only = False
+            if not text_only:
+                # Use general SYSTEM_PROMPT for visual analysis (Productivity/Terminal)
+                text = self.chat_text([
+                    {'role': 'system', 'content': config.SYSTEM_PROMPT},
+                    {'role': 'user', 'content': full_prompt, 'images': [image_data]}
+                ], cancel_event)
+            if text is None: return None # Superseded mid-generation
             print(f"DEBUG: RAW OBSERVER OUT: {text[:100]}...") # Limit log
 
             # Clean JSON
@@ -271,6 +333,10 @@ class Observer:
 
             payload = json.loads(text)
             payload["screen_context"] = ocr_text
+            if cache_key:
+                self.suggestion_cache.put(cache_key, payload, config.SUGGESTION_CACHE_TTL)
+            # Only a completed analysis marks this screen as seen (failures / cancels retry)
+            self.change_detector.commit(frame_signature)
             return payload
         except Exception as e:
             # print(f"Observer Analyze Error: {e}")
@@ -278,15 +344,50 @@ class Observer:
             # print(f"Ollama Analyze Error: {e}") 
             return None
 
+    def _route(self, ocr_text):
+        """Returns (text_only, reason). Vision is the fallback whenever OCR can't be trusted."""
+        confidence = self.tiled_ocr.last_confidence
+        if not config.OLLAMA_TEXT_MODEL:
+            return False, "text model disabled"
+        if not self.gateway.is_available(config.OLLAMA_TEXT_MODEL):
+            return False, "text model unavailable"
+        if not ocr_text:
+            return False, "no OCR text"
+        if len(ocr_text) < config.TEXT_ROUTE_MIN_CHARS:
+            return False, f"OCR too short: {len(ocr_text)} chars"
+        if confidence < config.TEXT_ROUTE_MIN_CONFIDENCE:
+            return False, f"OCR confidence {confidence:.0f}"
+        return True, f"{config.OLLAMA_TEXT_MODEL}, OCR confidence {confidence:.0f}, {len(ocr_text)} chars"
+
+    def chat_text(self, messages, cancel_event=None, model=None, label="proactive",
+                  priority=inference_gateway.PRIORITY_PROACTIVE):
+        """
+        Proactive / background model call. Streamed so a superseded request can be abandoned
+        mid-generation; returns the stripped reply, or None if cancelled.
+        Preemption by user chat re-queues the call behind it instead of dropping it.
+        """
+        while True:
+            try:
+                stream = self.gateway.chat(model=model or self.model, messages=messages, stream=True, label=label,
+                                           priority=priority, cancel_event=cancel_event)
+                text = ""
+                for chunk in stream:
+                    text += chunk['message']['content']
+                return text.strip()
+            except inference_gateway.InferenceCancelled as e:
+                if not e.preempted or (cancel_event is not None and cancel_event.is_set()):
+                    return None
+                print(f"Observer: [{label}] call preempted by chat. Re-queued.")
+
     def update_session_title(self, session_id, user_text):
         if not user_text: return
         try:
             # Generate a short 3-5 word title
             prompt = f"Summarize this user query into a short 3-5 word title: '{user_text}'. Return ONLY the title, no quotes."
-            response = ollama.chat(model=self.model, messages=[
-                {'role': 'user', 'content': prompt}
-            ])
-            title = response['message']['content'].strip().replace('"', '')
+            title = self.chat_text([{'role': 'user', 'content': prompt}], label="title",
+                                   priority=inference_gateway.PRIORITY_BACKGROUND)
+            if not title: return None
+            title = title.replace('"', '')
             
             # Save the new title
             filepath = os.path.join(self.chats_dir, f"{session_id}.json")
@@ -303,35 +404,35 @@ class Observer:
             print(f"Title Generation Error: {e}")
             return None
 
-    def read_file_content(self, path):
+    def read_file_content(self, path, query=None):
         try:
             if not path: return None
             _, ext = os.path.splitext(path)
             ext = ext.lower()
+            budget = config.ATTACHMENT_CHAR_BUDGET
             
             # 1. Try PDF
             if ext == '.pdf':
                 try:
-                    import pypdf
-                    reader = pypdf.PdfReader(path)
-                    text = ""
-                    for page in reader.pages[:10]: # Increased page limit to 10
-                         extract = page.extract_text()
-                         if extract:
-                             text += extract + "\n"
+                    # Previously extracted pages come from the on-disk cache
+                    entry = self.attachment_cache.lookup(path)
+                    # Pages are extracted lazily; stops once the prompt budget is full
+                    # (or, with a query, keeps the most relevant pages)
+                    text = attachment_reader.select_pages(attachment_reader.iter_pdf_pages(path, entry), budget, query)
+                    self.attachment_cache.store(entry)
                     
                     # FALLBACK: If text extraction failed (Scanned PDF), use OCR
                     if len(text.strip()) < 50:
                         try:
                             # Try PDF -> Image -> OCR Strategy
-                            from pdf2image import convert_from_path
-                            import pytesseract
-                            
                             print("PDF is likely scanned. Attempting OCR...")
-                            images = convert_from_path(path, first_page=1, last_page=3)
-                            ocr_text = ""
-                            for img in images:
-                                ocr_text += pytesseract.image_to_string(img) + "\n"
+                            # Pages render in a stream and OCR concurrently; closing stops rendering at budget
+                            ocr_pages = attachment_reader.iter_scanned_pdf_text(path, page_count=entry['page_count'], cached=entry['ocr_pages'])
+                            try:
+                                ocr_text = attachment_reader.select_pages(ocr_pages, budget)
+                            finally:
+                                ocr_pages.close()
+                                self.attachment_cache.store(entry)
                                 
                             if len(ocr_text.strip()) > 50:
                                 return f"[OCR EXTRACTED FROM SCANNED PDF]:\n{ocr_text}"
@@ -353,7 +454,7 @@ class Observer:
                 return f"[File type '{ext}' not currently supported for deep analysis, but path is: {path}]"
             
             with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read(50000) # Increased char limit
+                content = f.read(budget) # Only read what fits in the prompt
                 return content
         except Exception as e:
             return f"[Error reading file: {e}]"
@@ -444,7 +545,7 @@ Act as if this context is visible.\n"""
                          
                 else:
                     # Try reading text/pdf content
-                    content = self.read_file_content(attachment)
+                    content = self.read_file_content(attachment, query=user_query)
                     prompt_context = f"\n\n[PRIORITY CONTEXT - ATTACHED FILE: {os.path.basename(attachment)}]:\n{content}\n[END FILE]\n"
                     
                     if content.strip().startswith("[WARNING") or content.strip().startswith("[Error"):
@@ -508,15 +609,11 @@ Act as if this context is visible.\n"""
                 new_message['images'] = current_images
                 
             self.chat_history.append(new_message)
-            
-            # Generate Title if First Message
-            if len(self.chat_history) == 1:
-                t = threading.Thread(target=self.update_session_title, args=(self.current_session_id, user_query), daemon=True)
-                t.start()
+            first_message = len(self.chat_history) == 1
             
             # 8. Send to LLM
             messages_payload = [{'role': 'system', 'content': system_prompt}] + self.chat_history
-            stream = ollama.chat(model=self.model, messages=messages_payload, stream=True)
+            stream = self.gateway.chat(model=self.model, messages=messages_payload, stream=True, label="chat")
 
             full_response = ""
             for chunk in stream:
@@ -528,6 +625,11 @@ Act as if this context is visible.\n"""
             self.chat_history.append({'role': 'assistant', 'content': full_response})
             self.save_session()
 
+            # Generate Title if First Message (after the reply, so it never delays it)
+            if first_message:
+                t = threading.Thread(target=self.update_session_title, args=(self.current_session_id, user_query), daemon=True)
+                t.start()
+
         except Exception as e:
             print(f"Stream Error: {e}")
             yield f"[Error: {e}]"
@@ -571,10 +673,10 @@ Act as if this context is visible.\n"""
                         """
                         
                         # Call LLM
-                        response = ollama.chat(model=self.model, messages=[
+                        response = self.gateway.chat(model=self.model, messages=[
                              {'role': 'system', 'content': config.DEV_SYSTEM_PROMPT},
                              {'role': 'user', 'content': error_prompt}
-                        ])
+                        ], label="proactive", priority=inference_gateway.PRIORITY_PROACTIVE)
                         
                         # Parse
                         text = response['message']['content'].strip()
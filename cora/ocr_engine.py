@@ -3,6 +3,18 @@ import numpy as np
 import pytesseract
 from PIL import Image
 import os
+import hashlib
+import queue
+import threading
+from concurrent.futures import Future
+import config
+from frame import Frame
+
+# Optional: resident Tesseract via the C API (no process spawn / model reload per call)
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 # Default Tesseract Path (Windows)
 # Users can override this if installed elsewhere
@@ -25,48 +37,241 @@ def get_tesseract_path():
 tess_path = get_tesseract_path()
 if tess_path:
     pytesseract.pytesseract.tesseract_cmd = tess_path
-else:
+elif tesserocr is None:
     print("Warning: Tesseract OCR not found. Please install via: https://github.com/UB-Mannheim/tesseract/wiki")
 
-def extract_text(image_input):
+ocr_available = bool(tess_path) or tesserocr is not None
+
+class TesseractPool:
+    """
+    N long-lived Tesseract workers fed from a bounded job queue.
+    With tesserocr each worker keeps its own TessBaseAPI resident (traineddata loaded once,
+    no temp files). Without it workers fall back to pytesseract, which still bounds concurrency.
+    """
+    def __init__(self, workers=None, queue_size=None, lang='eng'):
+        self.lang = lang
+        self.jobs = queue.Queue(maxsize=queue_size or config.OCR_QUEUE_SIZE)
+        self.workers = workers or config.OCR_WORKERS
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"tesseract-{i}", daemon=True).start()
+
+    def submit(self, image, psm=3, with_words=False):
+        """
+        Queues an image (PIL or numpy) for OCR and returns a Future with the text,
+        or a list of words (left, top, width, height, text, confidence) when with_words is set.
+        Blocks while the queue is full (backpressure for large batches).
+        """
+        future = Future()
+        self.jobs.put((image, psm, with_words, future))
+        return future
+
+    def _create_api(self):
+        if tesserocr is None:
+            return None
+        try:
+            # Reuse the tessdata shipped next to tesseract.exe when we know where it is
+            tessdata = os.path.join(os.path.dirname(tess_path), "tessdata") if tess_path else None
+            if tessdata and os.path.isdir(tessdata):
+                return tesserocr.PyTessBaseAPI(path=tessdata, lang=self.lang)
+            return tesserocr.PyTessBaseAPI(lang=self.lang)
+        except Exception as e:
+            print(f"OCR: tesserocr init failed, using pytesseract: {e}")
+            return None
+
+    def _worker(self):
+        api = self._create_api()
+        while True:
+            image, psm, with_words, future = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if with_words:
+                    future.set_result(self._words(api, image, psm))
+                    continue
+                if api is not None:
+                    api.SetPageSegMode(psm)
+                    api.SetImage(Image.fromarray(image) if isinstance(image, np.ndarray) else image)
+                    text = api.GetUTF8Text()
+                else:
+                    text = pytesseract.image_to_string(image, config=f'--oem 3 --psm {psm}')
+                future.set_result(text.strip())
+            except Exception as e:
+                future.set_exception(e)
+
+    def _words(self, api, image, psm):
+        if api is None:
+            data = pytesseract.image_to_data(image, config=f'--oem 3 --psm {psm}', output_type=pytesseract.Output.DICT)
+            return _words_from_data(data)
+        api.SetPageSegMode(psm)
+        api.SetImage(Image.fromarray(image) if isinstance(image, np.ndarray) else image)
+        api.Recognize()
+        words = []
+        level = tesserocr.RIL.WORD
+        for item in tesserocr.iterate_level(api.GetIterator(), level):
+            word = (item.GetUTF8Text(level) or "").strip()
+            box = item.BoundingBox(level)
+            if word and box:
+                x0, y0, x1, y1 = box
+                words.append((x0, y0, x1 - x0, y1 - y0, word, item.Confidence(level)))
+        return words
+
+def _words_from_data(data):
+    """Word boxes (left, top, width, height, text, confidence) from image_to_data output."""
+    words = []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0: continue
+        words.append((data['left'][i], data['top'][i], data['width'][i], data['height'][i], word, conf))
+    return words
+
+def _columns(words):
     """
-    Extracts text from an image (PIL Image or numpy array) using Tesseract OCR.
-    Includes preprocessing for better accuracy.
+    x ranges of the text columns (sidebar / editor, two-column pages, chat panes): word
+    spans are merged across every line, so a column ends at a vertical gutter no line crosses.
     """
-    if not tess_path:
-        return ""
-
-    try:
-        # Convert PIL to OpenCV format
-        if isinstance(image_input, Image.Image):
-            point_img = image_input.convert('RGB')
-            img_np = np.array(point_img)
-            # Convert RGB to BGR for OpenCV
-            img = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-        elif isinstance(image_input, np.ndarray):
-            img = image_input
+    heights = sorted(w[3] for w in words)
+    gap = 2 * max(1, heights[len(heights) // 2]) # Wider than any inter-word space
+    columns = []
+    for x0, x1 in sorted((w[0], w[0] + w[2]) for w in words):
+        if columns and x0 <= columns[-1][1] + gap:
+            columns[-1][1] = max(columns[-1][1], x1)
         else:
+            columns.append([x0, x1])
+    return columns
+
+def _lines(words):
+    """Words whose vertical centers fall within half a line height of each other, read left to right."""
+    words = sorted(words, key=lambda w: w[1] + w[3] / 2)
+    lines = []
+    line, center, height = [], None, 0
+    for word in words:
+        word_center = word[1] + word[3] / 2
+        if line and abs(word_center - center) > max(height, word[3]) / 2:
+            lines.append(line)
+            line = []
+        if not line:
+            center, height = word_center, word[3]
+        line.append(word)
+    lines.append(line)
+    return "\n".join(" ".join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines)
+
+def _join_lines(words):
+    """
+    Rebuilds reading-order text from word boxes in frame coordinates: column by column
+    (left to right, separated by a blank line), each read line by line top to bottom.
+    """
+    if not words: return ""
+    bounds = _columns(words)
+    columns = [[] for _ in bounds]
+    for word in words:
+        index = next(i for i, (x0, x1) in enumerate(bounds) if x0 <= word[0] <= x1)
+        columns[index].append(word)
+    return "\n\n".join(_lines(column) for column in columns)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Shared Tesseract pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TesseractPool()
+        return _pool
+
+def _to_gray(image_input):
+    """Returns a single-channel uint8 array, or None for unsupported input."""
+    if isinstance(image_input, Frame):
+        return image_input.gray
+    if isinstance(image_input, Image.Image):
+        return np.array(image_input.convert('L'))
+    if isinstance(image_input, np.ndarray):
+        return image_input if image_input.ndim == 2 else cv2.cvtColor(image_input, cv2.COLOR_BGR2GRAY)
+    return None
+
+class TiledOCR:
+    """
+    Incremental OCR for a stream of frames.
+    Splits each frame into full-width horizontal bands that overlap by OCR_TILE_OVERLAP,
+    hashes every band and only re-runs Tesseract on bands whose pixels changed.
+    Unchanged bands reuse cached word boxes. Each band keeps only the words centered in
+    its own (non-overlapping) core, so a line cut at one band's edge is read whole by its
+    neighbour. Words are then split into columns at vertical gutters and merged into lines
+    by position, so side-by-side panes stay apart like psm 3's block segmentation kept them.
+    """
+    def __init__(self, rows=None, overlap=None):
+        self.rows = rows or config.OCR_TILE_ROWS
+        self.overlap = config.OCR_TILE_OVERLAP if overlap is None else overlap
+        self.shape = None # Frame shape the cache belongs to
+        self.tiles = {}   # row -> (digest, words in frame coordinates)
+        self.last_confidence = -1 # Mean confidence of the last stitched text (-1 = unknown)
+
+    def _bands(self, shape):
+        h = shape[0]
+        ys = [h * r // self.rows for r in range(self.rows + 1)]
+        for r in range(self.rows):
+            # (core y0, core y1, padded y0, padded y1)
+            yield r, (ys[r], ys[r + 1], max(0, ys[r] - self.overlap), min(h, ys[r + 1] + self.overlap))
+
+    def _submit_tile(self, tile):
+        # Per-band Otsu, so a change in one band never shifts another band's binarization
+        _, thresh = cv2.threshold(tile, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # psm 6: a band is a single uniform block of text
+        return get_pool().submit(thresh, psm=6, with_words=True)
+
+    def extract_text(self, image_input):
+        if not ocr_available:
             return ""
 
-        # PREPROCESSING
-        # 1. Grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # 2. Thresholding (Binary) - helps with sharp text
-        # Using Otsu's thresholding for adaptive binarization
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # 3. Denoising (Optional, can hurt small text)
-        # denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
-
-        # Run Tesseract
-        # psm 3: Fully automatic page segmentation, but no OSD. (Default)
-        # psm 6: Assume a single uniform block of text.
-        custom_config = r'--oem 3 --psm 3' 
-        text = pytesseract.image_to_string(thresh, config=custom_config)
-        
-        return text.strip()
+        try:
+            gray = _to_gray(image_input)
+            if gray is None:
+                return ""
+
+            # Different window / resolution -> bands no longer line up, start over
+            if gray.shape != self.shape:
+                self.shape = gray.shape
+                self.tiles = {}
+
+            # 1. Hash bands, submit only the dirty ones (they OCR in parallel on the pool)
+            pending = {}
+            for row, (core0, core1, y0, y1) in self._bands(gray.shape):
+                tile = np.ascontiguousarray(gray[y0:y1])
+                digest = hashlib.blake2b(tile.data, digest_size=16).digest()
+
+                cached = self.tiles.get(row)
+                if not cached or cached[0] != digest:
+                    pending[row] = (digest, core0, core1, y0, self._submit_tile(tile))
+
+            # 2. Collect results into the cache: frame coordinates, core words only
+            for row, (digest, core0, core1, y0, future) in pending.items():
+                words = []
+                for x, y, w, h, text, conf in future.result():
+                    y += y0
+                    if core0 <= y + h / 2 < core1:
+                        words.append((x, y, w, h, text, conf))
+                self.tiles[row] = (digest, words)
+
+            if pending:
+                print(f"OCR: {len(pending)}/{self.rows} bands re-recognized.")
+
+            # 3. Merge every band's words into lines by position
+            words = [word for row, _ in self._bands(gray.shape) for word in self.tiles[row][1]]
+
+            # Screen confidence: word confidences weighted by word length
+            scored = [(len(text), conf) for _, _, _, _, text, conf in words if conf >= 0]
+            chars = sum(n for n, _ in scored)
+            self.last_confidence = sum(n * conf for n, conf in scored) / chars if chars else -1
+
+            return _join_lines(words)
+
+        except Exception as e:
+            print(f"OCR Error: {e}")
+            self.last_confidence = -1
+            return ""
 
-    except Exception as e:
-        print(f"OCR Error: {e}")
-        return ""
+    def reset(self):
+        self.shape = None
+        self.tiles = {}
+        self.last_confidence = -1
@@ -0,0 +1,117 @@
+import time
+import threading
+import cv2
+import numpy as np
+
+import config
+
+class PayloadEncoder:
+    """
+    Encodes screen images for the vision model.
+    Resizes straight from the full-resolution capture to the model's input size
+    (there is no point sending pixels the model resamples away), optionally crops
+    to the text-dense region first, and compresses as JPEG / WebP / PNG.
+    Bytes produced and encode time are logged and accumulated in stats().
+    """
+    def __init__(self, max_side=None, max_pixels=None, fmt=None, quality=None, crop_to_text=None):
+        self.max_side = max_side or config.VISION_INPUT_SIDE
+        self.max_pixels = max_pixels or config.VISION_INPUT_PIXELS
+        self.fmt = (fmt or config.PAYLOAD_FORMAT).upper()
+        if self.fmt not in ("JPEG", "WEBP", "PNG"):
+            self.fmt = "JPEG"
+        self.quality = quality or config.PAYLOAD_QUALITY
+        self.crop_to_text = config.PAYLOAD_CROP_TO_TEXT if crop_to_text is None else crop_to_text
+        self.lock = threading.Lock()
+        self.totals = {"images": 0, "bytes": 0, "source_pixels": 0, "encode_ms": 0.0}
+
+    def _text_region(self, gray):
+        """
+        Bounding box (x0, y0, x1, y1) of text-dense content, as fractions of the image,
+        or None when the whole image is worth sending. Text = dense local contrast.
+        """
+        h, w = gray.shape
+        scale = 320 / max(w, h)
+        small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        edges = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8)) > 40
+
+        rows = np.flatnonzero(edges.mean(axis=1) > config.PAYLOAD_CROP_MIN_DENSITY)
+        cols = np.flatnonzero(edges.mean(axis=0) > config.PAYLOAD_CROP_MIN_DENSITY)
+        if not len(rows) or not len(cols):
+            return None
+
+        sh, sw = edges.shape
+        pad = 0.02
+        x0 = max(0.0, cols[0] / sw - pad)
+        x1 = min(1.0, (cols[-1] + 1) / sw + pad)
+        y0 = max(0.0, rows[0] / sh - pad)
+        y1 = min(1.0, (rows[-1] + 1) / sh + pad)
+
+        # Only worth it when a meaningful margin goes away, and never crop to a sliver
+        area = (x1 - x0) * (y1 - y0)
+        if area > 0.85 or (x1 - x0) < 0.25 or (y1 - y0) < 0.25:
+            return None
+        return (x0, y0, x1, y1)
+
+    def encode(self, image):
+        """image: Frame (full-resolution BGRA buffer) or PIL image. Returns encoded bytes."""
+        start = time.perf_counter()
+        # Crop and resize in the source pixel format; only the small result is converted
+        if hasattr(image, 'bgra'): # Frame (duck-typed: frame.py imports this module)
+            pixels, to_bgr = image.bgra, cv2.COLOR_BGRA2BGR # Zero-copy view of the capture
+            gray = image.gray if self.crop_to_text else None # Already computed for OCR
+        else:
+            pixels, to_bgr = np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR
+            gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY) if self.crop_to_text else None
+
+        h, w = pixels.shape[:2]
+        source_pixels = w * h
+
+        # 1. Crop to text-dense region (a slice, no copy)
+        region = self._text_region(gray) if gray is not None else None
+        if region:
+            x0, y0, x1, y1 = region
+            pixels = pixels[int(y0 * h):int(y1 * h), int(x0 * w):int(x1 * w)]
+            h, w = pixels.shape[:2]
+
+        # 2. Resize to the model's input resolution
+        scale = min(1.0, self.max_side / max(w, h), (self.max_pixels / (w * h)) ** 0.5)
+        if scale < 1.0:
+            pixels = cv2.resize(pixels, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        bgr = cv2.cvtColor(pixels, to_bgr)
+
+        # 3. Compress
+        fmt = self.fmt
+        if fmt == "WEBP":
+            ok, buf = cv2.imencode(".webp", bgr, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+            if not ok: fmt = "JPEG" # OpenCV built without libwebp
+        if fmt == "JPEG":
+            ok, buf = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        elif fmt == "PNG":
+            ok, buf = cv2.imencode(".png", bgr)
+        data = buf.tobytes()
+
+        ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.totals["images"] += 1
+            self.totals["bytes"] += len(data)
+            self.totals["source_pixels"] += source_pixels
+            self.totals["encode_ms"] += ms
+        crop_text = " (text crop)" if region else ""
+        print(f"Payload Encoder: {bgr.shape[1]}x{bgr.shape[0]}{crop_text} {fmt} -> {len(data) / 1024:.0f} KB in {ms:.0f} ms")
+        return data
+
+    def stats(self):
+        with self.lock:
+            n = self.totals["images"] or 1
+            return dict(self.totals, avg_bytes=self.totals["bytes"] / n, avg_encode_ms=self.totals["encode_ms"] / n)
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder():
+    """Shared payload encoder (created on first use)."""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = PayloadEncoder()
+        return _encoder
@@ -0,0 +1,86 @@
+import os
+import re
+import json
+import time
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+import config
+
+# Taskbar / status-bar clocks: a time alone on its OCR line, or one with AM/PM.
+# Times inside code (a[10:20], 12:30:00 in a string) don't match either form.
+_CLOCK = re.compile(r'^[ \t]*\d{1,2}:\d{2}(?::\d{2})?(?:[ \t]*[AaPp][Mm])?[ \t]*$'
+                    r'|(?<![\w\[(:.])\d{1,2}:\d{2}(?::\d{2})?[ \t]*[AaPp][Mm]\b', re.MULTILINE)
+
+def normalize_screen(text):
+    """Strips volatile UI text (clocks) from OCR'd screen text; everything else is kept verbatim."""
+    return _CLOCK.sub('', text or '')
+
+class SuggestionCache:
+    """
+    Persistent cache of model responses for proactive suggestions and error fixes.
+    Keys are hashes of the verbatim (mode, window, text, error signature) parts; each
+    entry carries its own expiry, and the least recently used entries are evicted
+    beyond max_entries. The table is saved to one JSON file so fixes survive restarts.
+    """
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or config.SUGGESTION_CACHE_PATH
+        self.max_entries = max_entries or config.SUGGESTION_CACHE_MAX_ENTRIES
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # key -> {'value', 'expires'}
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                now = time.time()
+                # Saved oldest-first, so insertion order restores the LRU order
+                for key, entry in json.load(f):
+                    if entry['expires'] > now:
+                        self.entries[key] = entry
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def key(self, *parts):
+        h = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            h.update(str(part).encode('utf-8', 'surrogatepass'))
+            h.update(b'\x00')
+        return h.hexdigest()
+
+    def get(self, key):
+        """Returns a copy of the cached value, or None if absent / expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry['expires'] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry['value']) # Callers decorate payloads in place
+
+    def put(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = {'value': copy.deepcopy(value), 'expires': time.time() + ttl}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._save()
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(list(self.entries.items()), f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Suggestion Cache Error: {e}")
@@ -0,0 +1,387 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+
+# Optional parsers (each validator degrades gracefully when missing)
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    from tree_sitter_languages import get_parser as ts_get_parser
+except ImportError:
+    ts_get_parser = None
+
+# ext -> (language, validator(content) -> error dict or None)
+VALIDATORS = {}
+
+def register(language, *exts):
+    def wrap(fn):
+        for ext in exts:
+            VALIDATORS[ext] = (language, fn)
+        return fn
+    return wrap
+
+def supports(ext):
+    return ext in VALIDATORS
+
+def _error(error_type, message, line, content):
+    lines = content.splitlines()
+    text = lines[line - 1] if line and 0 < line <= len(lines) else ""
+    return {"type": error_type, "message": message, "line": line, "text": text}
+
+# -----------------------------------------------------------------------------
+# Generic checkers
+# -----------------------------------------------------------------------------
+_PAIRS = {')': '(', ']': '[', '}': '{'}
+_REGEX_AFTER_CHARS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_AFTER_WORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                      'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+def _regex_end(content, i):
+    """
+    End index (after the flags) of a JS regex literal starting at content[i] == '/', or None when
+    the slash is a division. A slash starts a regex after an operator / opening token / keyword.
+    """
+    j = i - 1
+    while j >= 0 and content[j] in ' \t\r\n':
+        j -= 1
+    if j >= 0 and content[j] not in _REGEX_AFTER_CHARS:
+        k = j
+        while k >= 0 and (content[k].isalnum() or content[k] in '_$'):
+            k -= 1
+        if content[k + 1:j + 1] not in _REGEX_AFTER_WORDS:
+            return None
+    in_class = False
+    j = i + 1
+    n = len(content)
+    while j < n:
+        ch = content[j]
+        if ch == '\n':
+            return None # Regex literals never span lines
+        if ch == '\\':
+            j += 1
+        elif ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        elif ch == '/' and not in_class:
+            j += 1
+            while j < n and (content[j].isalnum() or content[j] == '_'):
+                j += 1 # Flags
+            return j
+        j += 1
+    return None
+
+def check_brackets(content, line_comment="//", block_comment=("/*", "*/"), quotes="\"'`", regex_literals=False):
+    """
+    Bracket / string / comment balance for C-like languages. Returns (message, line) or None.
+    regex_literals skips JavaScript regex literals (/\(/ is not an open bracket).
+    """
+    stack = []
+    line = 1
+    i, n = 0, len(content)
+    while i < n:
+        ch = content[i]
+        if ch == '\n':
+            line += 1
+        elif line_comment and content.startswith(line_comment, i):
+            end = content.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif block_comment and content.startswith(block_comment[0], i):
+            end = content.find(block_comment[1], i + len(block_comment[0]))
+            if end == -1:
+                return ("Unterminated comment", line)
+            line += content.count('\n', i, end)
+            i = end + len(block_comment[1])
+            continue
+        elif regex_literals and ch == '/' and _regex_end(content, i) is not None:
+            i = _regex_end(content, i)
+            continue
+        elif ch in quotes:
+            start_line = line
+            j = i + 1
+            while j < n and content[j] != ch:
+                if content[j] == '\\':
+                    j += 1
+                elif content[j] == '\n':
+                    if ch != '`':
+                        return ("Unterminated string literal", start_line)
+                    line += 1
+                j += 1
+            if j >= n:
+                return ("Unterminated string literal", start_line)
+            i = j + 1
+            continue
+        elif ch in '([{':
+            stack.append((ch, line))
+        elif ch in _PAIRS:
+            if not stack or stack[-1][0] != _PAIRS[ch]:
+                return (f"Unexpected '{ch}'", line)
+            stack.pop()
+        i += 1
+
+    if stack:
+        ch, open_line = stack[-1]
+        return (f"'{ch}' was never closed", open_line)
+    return None
+
+def _tree_sitter(language, content):
+    """First ERROR / MISSING node from a tree-sitter parse, as (message, line), or None."""
+    tree = ts_get_parser(language).parse(content.encode('utf-8'))
+    stack = [tree.root_node]
+    while stack:
+        node = stack.pop()
+        if node.type == 'ERROR' or node.is_missing:
+            message = f"Missing '{node.type}'" if node.is_missing else "Invalid syntax"
+            return (message, node.start_point[0] + 1)
+        if node.has_error:
+            stack.extend(reversed(node.children))
+    return None
+
+# -----------------------------------------------------------------------------
+# Language validators
+# -----------------------------------------------------------------------------
+@register("JSON", '.json')
+def validate_json(content):
+    try:
+        json.loads(content)
+    except json.JSONDecodeError as e:
+        return _error("JSONDecodeError", e.msg, e.lineno, content)
+    return None
+
+@register("YAML", '.yaml', '.yml')
+def validate_yaml(content):
+    if yaml is None: return None
+    try:
+        for _ in yaml.safe_load_all(content): pass
+    except yaml.MarkedYAMLError as e:
+        line = e.problem_mark.line + 1 if e.problem_mark else 0
+        return _error("YAMLError", e.problem or str(e), line, content)
+    except yaml.YAMLError as e:
+        return _error("YAMLError", str(e), 0, content)
+    return None
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+              'param', 'source', 'track', 'wbr', '!doctype'}
+_OPTIONAL_CLOSE = {'p', 'li', 'td', 'th', 'tr', 'option', 'dt', 'dd', 'thead', 'tbody',
+                   'tfoot', 'colgroup', 'html', 'head', 'body', 'optgroup', 'rt', 'rp'}
+
+class _TagBalanceParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.stack = [] # (tag, line)
+        self.problem = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in _VOID_TAGS:
+            self.stack.append((tag, self.getpos()[0]))
+
+    def handle_endtag(self, tag):
+        if self.problem or tag in _VOID_TAGS: return
+        if not any(t == tag for t, _ in self.stack):
+            self.problem = (f"Unexpected closing tag </{tag}>", self.getpos()[0])
+            return
+        # Implicitly close optional-close elements (e.g. <li> without </li>)
+        while self.stack:
+            open_tag, line = self.stack.pop()
+            if open_tag == tag: break
+            if open_tag not in _OPTIONAL_CLOSE:
+                self.problem = (f"<{open_tag}> closed by </{tag}>", line)
+                break
+
+@register("HTML", '.html', '.htm')
+def validate_html(content):
+    parser = _TagBalanceParser()
+    parser.feed(content)
+    parser.close()
+    problem = parser.problem
+    if not problem:
+        unclosed = [(t, l) for t, l in parser.stack if t not in _OPTIONAL_CLOSE]
+        if unclosed:
+            problem = (f"Unclosed <{unclosed[-1][0]}>", unclosed[-1][1])
+    return _error("HTMLError", problem[0], problem[1], content) if problem else None
+
+@register("CSS", '.css')
+def validate_css(content):
+    if ts_get_parser:
+        problem = _tree_sitter('css', content)
+    else:
+        problem = check_brackets(content, line_comment=None, quotes="\"'")
+    return _error("SyntaxError", problem[0], problem[1], content) if problem else None
+
+def _node_check(content):
+    """`node --check` for plain JavaScript, when Node is on PATH."""
+    node = shutil.which("node")
+    if not node: return False, None
+    fd, path = tempfile.mkstemp(suffix=".js")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        proc = subprocess.run([node, "--check", path], capture_output=True, text=True, timeout=config.SYNTAX_TIMEOUT)
+        if proc.returncode == 0: return True, None
+        # stderr: "<path>:<line>\n<code>\n<caret>\n\nSyntaxError: <message>"
+        line = 0
+        first = proc.stderr.splitlines()[0] if proc.stderr else ""
+        if ':' in first and first.rsplit(':', 1)[1].isdigit():
+            line = int(first.rsplit(':', 1)[1])
+        message = next((l for l in proc.stderr.splitlines() if l.startswith("SyntaxError")), "SyntaxError")
+        return True, (message.replace("SyntaxError: ", ""), line)
+    except (OSError, subprocess.TimeoutExpired):
+        return False, None
+    finally:
+        try: os.remove(path)
+        except OSError: pass
+
+def _c_like(language, ts_name, content, node_ok=False):
+    if ts_get_parser:
+        problem = _tree_sitter(ts_name, content)
+    else:
+        handled, problem = _node_check(content) if node_ok else (False, None)
+        if not handled:
+            js = language in ("JavaScript", "TypeScript")
+            problem = check_brackets(content, quotes="\"'`" if js else "\"'", regex_literals=js)
+    return _error("SyntaxError", problem[0], problem[1], content) if problem else None
+
+@register("JavaScript", '.js', '.mjs', '.cjs')
+def validate_javascript(content):
+    return _c_like("JavaScript", 'javascript', content, node_ok=True)
+
+@register("TypeScript", '.ts')
+def validate_typescript(content):
+    return _c_like("TypeScript", 'typescript', content)
+
+@register("JSX", '.jsx', '.tsx')
+def validate_jsx(content):
+    # JSX text (apostrophes, stray brackets) defeats the bracket heuristic and `node --check`:
+    # only a real parser reports here. The tsx grammar is a superset covering both.
+    if not ts_get_parser: return None
+    problem = _tree_sitter('tsx', content)
+    return _error("SyntaxError", problem[0], problem[1], content) if problem else None
+
+@register("C", '.c', '.h')
+def validate_c(content):
+    return _c_like("C", 'c', content)
+
+@register("C++", '.cpp', '.cc', '.cxx', '.hpp', '.hh')
+def validate_cpp(content):
+    return _c_like("C++", 'cpp', content)
+
+@register("Java", '.java')
+def validate_java(content):
+    return _c_like("Java", 'java', content)
+
+def _worker_pid():
+    return os.getpid()
+
+def run_validator(ext, content):
+    """Worker-process entry point. A validator that raises reports no error (the worker is fine)."""
+    language, fn = VALIDATORS[ext]
+    try:
+        error = fn(content)
+    except Exception as e: # e.g. RecursionError from json.loads on deeply nested input
+        print(f"Syntax Validator: {language} validator failed: {type(e).__name__}: {e}")
+        return None
+    if error:
+        error["language"] = language
+    return error
+
+# -----------------------------------------------------------------------------
+# Worker pool
+# -----------------------------------------------------------------------------
+class ValidatorUnavailable(Exception):
+    """The check did not run to completion (pool starting, busy or timed out): result unknown."""
+
+class ValidatorPool:
+    """
+    Runs validators in a small process pool with a per-file timeout, so a slow or
+    pathological parse can never stall the caller. Workers are started ahead of time
+    (warm_up) and checks are only submitted to a ready pool, one per idle worker, so
+    the timeout measures the parse itself, not process start-up or queueing.
+    Checks that can't run raise ValidatorUnavailable instead of queueing up.
+    """
+    def __init__(self, workers=None, timeout=None):
+        self.workers = workers or config.SYNTAX_WORKERS
+        self.timeout = timeout or config.SYNTAX_TIMEOUT
+        self.slots = threading.BoundedSemaphore(self.workers)
+        self.executor = None
+        self.ready = threading.Event() # Every worker process is up
+        self.lock = threading.Lock()
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def warm_up(self):
+        """Starts every worker process (with spawn each one re-imports the app) and waits for it."""
+        executor = self._get_executor()
+        start = time.time()
+        deadline = start + config.SYNTAX_POOL_START_TIMEOUT
+        pids = set()
+        try:
+            while len(pids) < self.workers and time.time() < deadline:
+                futures = [executor.submit(_worker_pid) for _ in range(self.workers)]
+                pids.update(f.result(timeout=max(0.1, deadline - time.time())) for f in futures)
+        except Exception as e:
+            print(f"Syntax Validator: worker start-up failed: {e}")
+        if pids and self.executor is executor:
+            self.ready.set()
+            print(f"Syntax Validator: {len(pids)} worker(s) ready in {time.time() - start:.2f}s.")
+
+    def warm_up_async(self):
+        t = threading.Thread(target=self.warm_up, name="validator-warmup", daemon=True)
+        t.start()
+        return t
+
+    def _restart(self, rewarm=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+            self.ready.clear()
+        if executor:
+            # A hung parse never returns; kill the workers rather than leak them
+            for proc in list(getattr(executor, '_processes', {}).values()):
+                proc.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+        if rewarm:
+            self.warm_up_async() # The next check must not pay the cold start inside its timeout
+
+    def validate(self, ext, content):
+        if not supports(ext): return None
+        if not self.ready.is_set():
+            raise ValidatorUnavailable("workers starting")
+        if not self.slots.acquire(blocking=False):
+            print(f"Syntax Validator: pool busy, skipping {ext} check.")
+            raise ValidatorUnavailable("pool busy")
+        try:
+            future = self._get_executor().submit(run_validator, ext, content)
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            print(f"Syntax Validator: {ext} check timed out after {self.timeout}s. Restarting workers.")
+            self._restart()
+            raise ValidatorUnavailable("timed out")
+        except BrokenProcessPool as e:
+            print(f"Syntax Validator: worker died ({e}). Restarting workers.")
+            self._restart()
+            raise ValidatorUnavailable("worker died")
+        except Exception as e:
+            # Submission / pickling problems: the workers themselves are healthy
+            print(f"Syntax Validator Error: {e}")
+            raise ValidatorUnavailable(str(e))
+        finally:
+            self.slots.release()
+
+    def shutdown(self):
+        self._restart(rewarm=False)
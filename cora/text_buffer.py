@@ -0,0 +1,107 @@
+import bisect
+
+class PieceTable:
+    """
+    Editable text buffer for documents synced from the editor.
+    The text is a sequence of pieces (buffer index, start, length) over immutable
+    strings: the original content plus one string per insertion. An edit only splits
+    the pieces it touches, so applying a keystroke never copies the document; the
+    flat string is materialized lazily (and cached) when a reader asks for it.
+    """
+    MAX_PIECES = 256 # Flatten beyond this so edits stay cheap
+    MAX_RETAINED_RATIO = 2 # Flatten once buffers hold this many times the text (deleted text is garbage)
+    RETAINED_SLACK = 4096 # ... plus this, so small documents aren't flattened on every keystroke
+
+    def __init__(self, text=""):
+        self._reset(text)
+
+    def _reset(self, text):
+        self.buffers = [text]
+        self.pieces = [(0, 0, len(text))] if text else []
+        self.length = len(text)
+        self.retained = len(text) # Characters held by self.buffers, live or deleted
+        self._text = text
+
+    def __len__(self):
+        return self.length
+
+    def edit(self, offset, delete_len, text):
+        """Replaces delete_len characters at offset with text (code point offsets)."""
+        end = offset + delete_len
+        if offset < 0 or delete_len < 0 or end > self.length:
+            raise ValueError(f"Edit [{offset}, {end}) outside buffer of length {self.length}")
+
+        if text:
+            self.buffers.append(text)
+            self.retained += len(text)
+            inserted = (len(self.buffers) - 1, 0, len(text))
+        else:
+            inserted = None
+
+        new_pieces = []
+        pos = 0
+        placed = inserted is None
+        for buf, start, length in self.pieces:
+            piece_end = pos + length
+            # Part before the edit
+            if pos < offset:
+                keep = min(length, offset - pos)
+                new_pieces.append((buf, start, keep))
+            # The insertion goes right where the edit starts
+            if not placed and piece_end >= offset:
+                new_pieces.append(inserted)
+                placed = True
+            # Part after the deleted range
+            if piece_end > end:
+                skip = max(0, end - pos)
+                new_pieces.append((buf, start + skip, length - skip))
+            pos = piece_end
+        if not placed:
+            new_pieces.append(inserted) # Empty buffer / append at the very end
+
+        self.pieces = new_pieces
+        self.length += len(text) - delete_len
+        self._text = None
+
+        if len(self.pieces) > self.MAX_PIECES or \
+                self.retained > self.MAX_RETAINED_RATIO * self.length + self.RETAINED_SLACK:
+            self._reset(self.text())
+
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self.buffers[buf][start:start + length] for buf, start, length in self.pieces)
+        return self._text
+
+class LineIndex:
+    """
+    Start offsets of every line in a text, so line ranges are sliced straight out of
+    the string (no per-line list) and offsets map to lines by binary search.
+    Lines end at '\n' (a '\r\n' line keeps its '\r').
+    """
+    def __init__(self, text):
+        self.text = text
+        starts = [0]
+        find = text.find
+        pos = find('\n')
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = find('\n', pos + 1)
+        if starts[-1] == len(text) and len(starts) > 1:
+            starts.pop() # Trailing newline doesn't open another line
+        self.starts = starts
+
+    def __len__(self):
+        return len(self.starts) if self.text else 0
+
+    def line_of(self, offset):
+        """0-based line containing offset."""
+        return bisect.bisect_right(self.starts, offset) - 1
+
+    def slice(self, start_line, end_line):
+        """Text of 0-based lines [start_line, end_line), line endings included."""
+        n = len(self)
+        start_line = max(0, min(start_line, n))
+        end_line = max(start_line, min(end_line, n))
+        if start_line == end_line: return ""
+        end = self.starts[end_line] if end_line < n else len(self.text)
+        return self.text[self.starts[start_line]:end]
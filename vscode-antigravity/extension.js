@@ -1,48 +1,286 @@
 
 const vscode = require('vscode');
 const http = require('http');
+const net = require('net');
 
-let debounceTimer;
+const HTTP_PORT = 54321;
+const SOCKET_PORT = 54322;
+
+// Per-document sync state (keyed by fileName):
+// { syncedVersion, pending: [changes], timer, inFlight, astral }
+const docs = new Map();
+
+// Change offsets are UTF-16 code units; Cora indexes code points.
+// They only agree while the document has no surrogate pairs (astral characters).
+const SURROGATE = /[\uD800-\uDFFF]/;
+
+// Persistent connection to Cora: length-prefixed JSON frames, batched,
+// one batch in flight at a time (queued messages wait for its ack = backpressure).
+let socket = null;
+let connected = false;
+let readBuffer = Buffer.alloc(0);
+let outbox = [];       // [{ message, done }]
+let inFlightBatch = null;
+let nextBatchId = 1;
+let reconnectTimer = null;
+let diagnostics = null;
 
 function activate(context) {
     console.log('Antigravity VS Code Bridge is active!');
 
-    // 1. Listen for text changes
+    // Syntax errors pushed back by Cora
+    diagnostics = vscode.languages.createDiagnosticCollection('cora');
+    context.subscriptions.push(diagnostics);
+    connect();
+
+    // 1. Listen for text changes (queued as deltas)
     vscode.workspace.onDidChangeTextDocument(event => {
         const document = event.document;
 
         // Filter relevant files (Python only for now)
         if (document.languageId !== 'python') return;
+        if (event.contentChanges.length === 0) return;
+
+        const state = getState(document);
+        for (const change of event.contentChanges) {
+            if (SURROGATE.test(change.text)) state.astral = true;
+            state.pending.push({
+                offset: change.rangeOffset,
+                length: change.rangeLength,
+                text: change.text
+            });
+        }
 
         // Debounce (Wait 500ms after last keystroke)
-        clearTimeout(debounceTimer);
-        debounceTimer = setTimeout(() => {
-            pushContent(document);
-        }, 500);
+        schedule(document, state);
     });
 
     // 2. Listen for active editor changes
     vscode.window.onDidChangeActiveTextEditor(editor => {
         if (editor && editor.document.languageId === 'python') {
-            pushContent(editor.document);
+            focusDocument(editor.document, getState(editor.document));
         }
     });
+
+    vscode.workspace.onDidCloseTextDocument(document => {
+        const state = docs.get(document.fileName);
+        if (!state) return;
+        clearTimeout(state.timer);
+        docs.delete(document.fileName);
+
+        // Cora drops its copy (disk is current again) and our markers go with it
+        diagnostics.delete(document.uri);
+        send('close', { file_path: document.fileName }, state, () => { });
+    });
+}
+
+function getState(document) {
+    let state = docs.get(document.fileName);
+    if (!state) {
+        state = { syncedVersion: null, pending: [], timer: null, inFlight: false, astral: false };
+        docs.set(document.fileName, state);
+    }
+    return state;
 }
 
-function pushContent(document) {
+function schedule(document, state) {
+    clearTimeout(state.timer);
+    state.timer = setTimeout(() => flush(document, state), 500);
+}
+
+function flush(document, state) {
+    // One request per document at a time; edits keep queueing meanwhile
+    if (state.inFlight) {
+        schedule(document, state);
+        return;
+    }
+    if (state.pending.length === 0) return;
+
+    // No known server version, or offsets can't be trusted -> full document
+    if (state.syncedVersion === null || state.astral) {
+        pushContent(document, state);
+        return;
+    }
+
+    const version = document.version;
+    const changes = state.pending;
+    state.pending = [];
+
+    send('apply_changes', {
+        file_path: document.fileName,
+        base_version: state.syncedVersion,
+        version: version,
+        changes: changes
+    }, state, (status) => {
+        if (status === 200) {
+            state.syncedVersion = version;
+        } else {
+            // 409 = Cora's buffer is at another version (restart, tab switch, lost update)
+            pushContent(document, state);
+        }
+    });
+}
+
+function focusDocument(document, state) {
+    // Cora keeps every synced document; only resend when its copy can't be current
+    if (state.syncedVersion === null || state.pending.length > 0 || state.inFlight) {
+        if (!state.inFlight) pushContent(document, state);
+        else schedule(document, state);
+        return;
+    }
+
+    send('focus', {
+        file_path: document.fileName,
+        version: document.version
+    }, state, (status) => {
+        if (status !== 200) pushContent(document, state);
+    });
+}
+
+function pushContent(document, state) {
     const content = document.getText();
-    const filePath = document.fileName;
+    const version = document.version;
 
-    const data = JSON.stringify({
-        file_path: filePath,
+    // The full text includes every queued edit
+    clearTimeout(state.timer);
+    state.pending = [];
+    state.astral = SURROGATE.test(content);
+
+    send('update_buffer', {
+        file_path: document.fileName,
         buffer_content: content,
-        language: document.languageId
+        language: document.languageId,
+        version: version
+    }, state, (status) => {
+        state.syncedVersion = status === 200 ? version : null;
     });
+}
+
+// -----------------------------------------------------------------------------
+// Transport
+// -----------------------------------------------------------------------------
+function send(op, payload, state, onDone) {
+    state.inFlight = true;
+    const done = (status) => {
+        state.inFlight = false;
+        onDone(status);
+    };
+
+    payload.op = op;
+    if (connected) {
+        outbox.push({ message: payload, done: done });
+        flushOutbox();
+    } else {
+        httpPost('/' + op, payload, done); // Cora started without the socket, or reconnecting
+    }
+}
+
+function connect() {
+    reconnectTimer = null;
+    const sock = net.createConnection({ host: '127.0.0.1', port: SOCKET_PORT });
+    sock.setNoDelay(true);
+
+    sock.on('connect', () => {
+        socket = sock;
+        connected = true;
+        readBuffer = Buffer.alloc(0);
+        console.log('Antigravity Bridge: persistent connection to Cora established.');
+        flushOutbox();
+    });
+    sock.on('data', onData);
+    sock.on('error', () => { }); // 'close' follows and handles it
+    sock.on('close', () => {
+        socket = null;
+        connected = false;
+
+        // Unacknowledged batch -> its documents resync in full; queued messages go over HTTP
+        const batch = inFlightBatch;
+        inFlightBatch = null;
+        if (batch) batch.entries.forEach(entry => entry.done(0));
+        const queued = outbox;
+        outbox = [];
+        queued.forEach(entry => httpPost('/' + entry.message.op, entry.message, entry.done));
+
+        if (!reconnectTimer) reconnectTimer = setTimeout(connect, 5000);
+    });
+}
+
+function flushOutbox() {
+    if (!connected || inFlightBatch || outbox.length === 0) return;
+
+    inFlightBatch = { id: nextBatchId++, entries: outbox };
+    outbox = [];
+    writeFrame({
+        type: 'batch',
+        id: inFlightBatch.id,
+        messages: inFlightBatch.entries.map(entry => entry.message)
+    });
+}
+
+function writeFrame(payload) {
+    const body = Buffer.from(JSON.stringify(payload), 'utf8');
+    const header = Buffer.alloc(4);
+    header.writeUInt32BE(body.length, 0);
+    socket.write(Buffer.concat([header, body]));
+}
+
+function onData(chunk) {
+    readBuffer = Buffer.concat([readBuffer, chunk]);
+    while (readBuffer.length >= 4) {
+        const length = readBuffer.readUInt32BE(0);
+        if (readBuffer.length < 4 + length) break;
+        let message;
+        try {
+            message = JSON.parse(readBuffer.subarray(4, 4 + length).toString('utf8'));
+            if (!message || typeof message !== 'object') throw new Error('frame is not an object');
+        } catch (e) {
+            // Framing is out of sync: drop the connection ('close' resyncs and reconnects)
+            console.error(`Antigravity Bridge: malformed frame from Cora (${e.message}). Reconnecting.`);
+            readBuffer = Buffer.alloc(0);
+            if (socket) socket.destroy();
+            return;
+        }
+        readBuffer = readBuffer.subarray(4 + length);
+        handleMessage(message);
+    }
+}
+
+function handleMessage(message) {
+    if (message.type === 'ack') {
+        if (!inFlightBatch || message.id !== inFlightBatch.id) return;
+        const batch = inFlightBatch;
+        inFlightBatch = null;
+        batch.entries.forEach((entry, i) => {
+            const result = message.results[i];
+            entry.done(result ? result.code : 0);
+        });
+        flushOutbox();
+    } else if (message.type === 'diagnostics') {
+        showDiagnostics(message.file_path, message.diagnostics);
+    }
+}
+
+function showDiagnostics(filePath, items) {
+    const document = vscode.workspace.textDocuments.find(doc => doc.fileName === filePath);
+    const entries = items.map(item => {
+        const line = Math.max(0, item.line - 1);
+        const range = document && line < document.lineCount
+            ? document.lineAt(line).range
+            : new vscode.Range(line, 0, line, 0);
+        const diagnostic = new vscode.Diagnostic(range, item.message, vscode.DiagnosticSeverity.Error);
+        diagnostic.source = item.language ? `Cora (${item.language})` : 'Cora';
+        return diagnostic;
+    });
+    diagnostics.set(vscode.Uri.file(filePath), entries);
+}
+
+function httpPost(path, payload, onDone) {
+    const data = JSON.stringify(payload);
 
     const options = {
         hostname: '127.0.0.1',
-        port: 54321,
-        path: '/update_buffer',
+        port: HTTP_PORT,
+        path: path,
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -51,18 +289,27 @@ function pushContent(document) {
     };
 
     const req = http.request(options, (res) => {
-        // console.log(`STATUS: ${res.statusCode}`);
+        res.resume(); // Drain the small JSON reply
+        res.on('end', () => onDone(res.statusCode));
     });
 
     req.on('error', (e) => {
         console.error(`Problem with request: ${e.message}`);
+        onDone(0);
     });
 
     req.write(data);
     req.end();
 }
 
-function deactivate() { }
+function deactivate() {
+    clearTimeout(reconnectTimer);
+    reconnectTimer = null;
+    if (socket) {
+        socket.removeAllListeners('close');
+        socket.destroy();
+    }
+}
 
 module.exports = {
     activate,